@@ -0,0 +1,44 @@
+"""
+###   Benchmarks - 运行环境
+-     在临时存档目录中以无驱动模式初始化 NoneBot 并加载插件，不会触碰真实的存档。
+"""
+
+from __future__ import annotations
+
+from tempfile import mkdtemp
+from types import ModuleType
+
+import nonebot
+
+
+def init(**kwargs) -> ModuleType:
+    """
+    Initialize NoneBot with a throwaway savedata directory and return the `RAM` module.
+    """
+    kwargs.setdefault("savedata", mkdtemp(prefix="rauthman-bench-"))
+    nonebot.init(driver="~none", **kwargs)
+    nonebot.load_plugin("nonebot_plugin_rauthman")
+    from nonebot_plugin_rauthman import RAM
+
+    return RAM
+
+
+def make_bot():
+    from nonebot.adapters.onebot.v11 import Adapter, Bot
+
+    from ._events import SELF_ID
+
+    return Bot(Adapter(nonebot.get_driver()), f"{SELF_ID}")
+
+
+def make_event(payload: dict):
+    from nonebot.adapters.onebot.v11 import Adapter
+
+    return Adapter.json_to_event(payload)
+
+
+def checker(rule):
+    """
+    Unwrap the bare `_isInService` coroutine function from a `Rule`, skipping dependency injection.
+    """
+    return next(iter(rule.checkers)).call
@@ -0,0 +1,57 @@
+"""
+###   Benchmarks - 合成存档
+-     生成包含指定数量群聊的 `global.json`，功能与级别按固定种子随机分配，同样的参数总是生成同样的存档。
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from random import Random
+
+from ujson import dumps as dumpJsonS
+
+SERVICES = tuple(f"sv{i}" for i in range(32))
+"""合成存档中出现的功能名称"""
+
+FIRST_GROUP = 100000
+"""合成存档中第一个群聊的群号，其余群号依次递增"""
+
+
+def group_ids(count: int) -> range:
+    return range(FIRST_GROUP, FIRST_GROUP + count)
+
+
+def generate(count: int, *, seed: int = 0) -> dict:
+    """
+    Build the document of a `global.json` holding `count` groups.
+
+    Every group enables a few services, a fifth of them also disables one, and
+    every group has a level between 0 and 5.
+    """
+    _random = Random(seed)
+    _groups = {}
+    for group_id in group_ids(count):
+        _enabled = _random.sample(SERVICES, _random.randint(1, 8))
+        _home = {"enabled": sorted(_enabled), "level": _random.randint(0, 5)}
+        if _random.random() < 0.2:
+            _home["disabled"] = [
+                _random.choice([i for i in SERVICES if i not in _enabled])
+            ]
+        _groups[f"{group_id}"] = _home
+    return {
+        "RAM": {
+            "module_name": "RAM",
+            "cqhttp": {"group": {}, "private": {}},
+            "onebot_v11": {"group": _groups, "private": {}},
+        }
+    }
+
+
+def write(savedata: str, count: int, *, seed: int = 0) -> Path:
+    """
+    Write the generated document as `global.json` under `savedata` and return its path.
+    """
+    _path = Path(savedata) / "global.json"
+    _path.parent.mkdir(parents=True, exist_ok=True)
+    _path.write_text(dumpJsonS(generate(count, seed=seed), indent=4), encoding="utf-8")
+    return _path
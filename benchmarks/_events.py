@@ -0,0 +1,175 @@
+"""
+###   Benchmarks - 合成 OneBot V11 事件
+-     按 go-cqhttp 上报格式生成各类事件的原始 JSON，可直接交给 `Adapter.json_to_event` 解析。
+"""
+
+from __future__ import annotations
+
+from time import time
+from typing import Callable
+
+SELF_ID = 10000
+
+
+def _base(post_type: str) -> dict:
+    return {"time": int(time()), "self_id": SELF_ID, "post_type": post_type}
+
+
+def _sender(user_id: int) -> dict:
+    return {"user_id": user_id, "nickname": f"{user_id}", "sex": "unknown", "age": 0}
+
+
+def group_message(group_id: int = 1, user_id: int = 2) -> dict:
+    return {
+        **_base("message"),
+        "message_type": "group",
+        "sub_type": "normal",
+        "message_id": 1,
+        "user_id": user_id,
+        "group_id": group_id,
+        "message": "hello",
+        "raw_message": "hello",
+        "font": 0,
+        "sender": _sender(user_id),
+    }
+
+
+def private_message(group_id: int = 1, user_id: int = 2) -> dict:
+    return {
+        **_base("message"),
+        "message_type": "private",
+        "sub_type": "friend",
+        "message_id": 1,
+        "user_id": user_id,
+        "message": "hello",
+        "raw_message": "hello",
+        "font": 0,
+        "sender": _sender(user_id),
+    }
+
+
+def _notice(notice_type: str, group_id: int, user_id: int, **kwargs) -> dict:
+    _payload = {**_base("notice"), "notice_type": notice_type, "user_id": user_id}
+    if group_id is not None:
+        _payload["group_id"] = group_id
+    _payload.update(kwargs)
+    return _payload
+
+
+def group_upload(group_id: int = 1, user_id: int = 2) -> dict:
+    _file = {"id": "1", "name": "a.txt", "size": 1, "busid": 0}
+    return _notice("group_upload", group_id, user_id, file=_file)
+
+
+def group_admin(group_id: int = 1, user_id: int = 2) -> dict:
+    return _notice("group_admin", group_id, user_id, sub_type="set")
+
+
+def group_decrease(group_id: int = 1, user_id: int = 2) -> dict:
+    return _notice(
+        "group_decrease", group_id, user_id, sub_type="leave", operator_id=user_id
+    )
+
+
+def group_increase(group_id: int = 1, user_id: int = 2) -> dict:
+    return _notice(
+        "group_increase", group_id, user_id, sub_type="approve", operator_id=user_id
+    )
+
+
+def group_ban(group_id: int = 1, user_id: int = 2) -> dict:
+    return _notice(
+        "group_ban", group_id, user_id, sub_type="ban", operator_id=user_id, duration=60
+    )
+
+
+def friend_add(group_id: int = 1, user_id: int = 2) -> dict:
+    return _notice("friend_add", None, user_id)
+
+
+def group_recall(group_id: int = 1, user_id: int = 2) -> dict:
+    return _notice("group_recall", group_id, user_id, operator_id=user_id, message_id=1)
+
+
+def friend_recall(group_id: int = 1, user_id: int = 2) -> dict:
+    return _notice("friend_recall", None, user_id, message_id=1)
+
+
+def poke(group_id: int = 1, user_id: int = 2) -> dict:
+    return _notice("notify", group_id, user_id, sub_type="poke", target_id=SELF_ID)
+
+
+def lucky_king(group_id: int = 1, user_id: int = 2) -> dict:
+    return _notice(
+        "notify", group_id, user_id, sub_type="lucky_king", target_id=user_id
+    )
+
+
+def honor(group_id: int = 1, user_id: int = 2) -> dict:
+    return _notice(
+        "notify", group_id, user_id, sub_type="honor", honor_type="talkative"
+    )
+
+
+def friend_request(group_id: int = 1, user_id: int = 2) -> dict:
+    return {
+        **_base("request"),
+        "request_type": "friend",
+        "user_id": user_id,
+        "comment": "",
+        "flag": "1",
+    }
+
+
+def group_request(group_id: int = 1, user_id: int = 2) -> dict:
+    return {
+        **_base("request"),
+        "request_type": "group",
+        "sub_type": "add",
+        "group_id": group_id,
+        "user_id": user_id,
+        "comment": "",
+        "flag": "1",
+    }
+
+
+def lifecycle(group_id: int = 1, user_id: int = 2) -> dict:
+    return {
+        **_base("meta_event"),
+        "meta_event_type": "lifecycle",
+        "sub_type": "connect",
+    }
+
+
+def heartbeat(group_id: int = 1, user_id: int = 2) -> dict:
+    return {
+        **_base("meta_event"),
+        "meta_event_type": "heartbeat",
+        "status": {"online": True, "good": True},
+        "interval": 5000,
+    }
+
+
+KINDS: dict[str, Callable[..., dict]] = {
+    "group_message": group_message,
+    "private_message": private_message,
+    "group_upload": group_upload,
+    "group_admin": group_admin,
+    "group_decrease": group_decrease,
+    "group_increase": group_increase,
+    "group_ban": group_ban,
+    "friend_add": friend_add,
+    "group_recall": group_recall,
+    "friend_recall": friend_recall,
+    "poke": poke,
+    "lucky_king": lucky_king,
+    "honor": honor,
+    "friend_request": friend_request,
+    "group_request": group_request,
+    "lifecycle": lifecycle,
+    "heartbeat": heartbeat,
+}
+"""
+###   Benchmarks - 事件种类
+-     事件种类名称到 payload 生成函数的映射，顺序与 `isInService` 的分派表一致。
+"""
@@ -0,0 +1,38 @@
+"""
+###   Benchmarks - isInService 事件分派
+-     对每一种 OneBot V11 事件，测量单条 `isInService` Rule 的平均耗时。
+-     用法：在仓库根目录执行 `python -m benchmarks.dispatch [次数]`
+"""
+
+from __future__ import annotations
+
+import asyncio
+from sys import argv
+from time import perf_counter_ns
+
+from . import _bootstrap
+from ._events import KINDS
+
+
+async def measure(check, bot, event, rounds: int) -> float:
+    for _ in range(min(rounds, 1000)):
+        await check(bot, event)
+    start = perf_counter_ns()
+    for _ in range(rounds):
+        await check(bot, event)
+    return (perf_counter_ns() - start) / rounds
+
+
+async def main(rounds: int) -> None:
+    RAM = _bootstrap.init(log_level="ERROR")
+    bot = _bootstrap.make_bot()
+    check = _bootstrap.checker(RAM.isInService("bench", 1))
+    RAM._amc.set_universal(bot, 1, [RAM._opt.add, "bench"])
+    print(f"{'event':<16} {'ns/event':>10}")
+    for kind, payload in KINDS.items():
+        event = _bootstrap.make_event(payload(group_id=1))
+        print(f"{kind:<16} {await measure(check, bot, event, rounds):>10.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(argv[1]) if len(argv) > 1 else 100000))
@@ -0,0 +1,179 @@
+"""
+###   Benchmarks - 事件回放
+-     将 JSON Lines 格式的 OneBot V11 事件流按目标速率交给 NoneBot 处理，
+      事件经过一组由 `isInService` 保护的 Matcher，不需要连接 go-cqhttp。
+-     报告吞吐量、处理延迟的分位数与 Rule 判定结果的分布；处理延迟包含 NoneBot 自身的事件分发，
+      `rule mean` 一行则是 `isInService` 单独的平均耗时，来自 `ram_metrics`。
+-     用法：在仓库根目录执行 `python -m benchmarks.replay [事件流.jsonl] [--rate 每秒事件数]`
+-     不指定事件流时按 `--synthesize` 合成，`--record` 可以把合成的事件流保存下来重复使用。
+"""
+
+from __future__ import annotations
+
+import asyncio
+from argparse import ArgumentParser
+from collections import Counter
+from pathlib import Path
+from random import Random
+from tempfile import mkdtemp
+from time import perf_counter
+from typing import Iterator, Optional
+
+from ujson import dumps as dumpJsonS
+from ujson import loads as loadJsonS
+
+from . import _bootstrap, _data
+from ._events import KINDS
+
+WEIGHTS = {"group_message": 80, "private_message": 5, "heartbeat": 5}
+"""合成事件流中各类事件的权重，未列出的事件种类权重为 1"""
+
+
+def synthesize(count: int, groups: int, *, seed: int = 0) -> Iterator[dict]:
+    """
+    Yield `count` event payloads of every kind in `KINDS`, mostly group messages,
+    addressed to the groups of a `groups`-sized generated save.
+    """
+    _random = Random(seed)
+    _kinds = list(KINDS)
+    _weights = [WEIGHTS.get(i, 1) for i in _kinds]
+    _group_ids = _data.group_ids(groups)
+    for _ in range(count):
+        _kind = _random.choices(_kinds, _weights)[0]
+        yield KINDS[_kind](group_id=_random.choice(_group_ids))
+
+
+def read_stream(path: Path) -> Iterator[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield loadJsonS(line)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    The `q`-th percentile of sorted `values` by the nearest-rank method.
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))]
+
+
+class Replay:
+    """
+    ##    Replay - 事件回放
+    -     每个功能注册一个由 `isInService` 保护的 Matcher，Matcher 被触发即代表判定通过。
+    -     事件按开环方式调度：第 i 个事件在开始后 i / rate 秒送出，不等待前一个事件处理完成的时间，
+          处理不过来时积压体现为调度延迟。
+    """
+
+    def __init__(self, services: list[str], level: Optional[int] = None) -> None:
+        from nonebot import on
+        from nonebot.message import handle_event
+
+        from nonebot_plugin_rauthman import isInService
+
+        self.handle_event = handle_event
+        self.triggered: Counter[str] = Counter()
+        for service in services:
+            _matcher = on(rule=isInService(service, level), block=False)
+            _matcher.append_handler(self._handler(service))
+
+    def _handler(self, service: str):
+        async def _handle() -> None:
+            self.triggered[service] += 1
+
+        return _handle
+
+    async def run(self, bot, events: list, rate: float) -> dict:
+        _latency = []
+        _lag = []
+        _start = perf_counter()
+        for i, _event in enumerate(events):
+            if rate:
+                _due = _start + i / rate
+                _now = perf_counter()
+                if _due > _now:
+                    await asyncio.sleep(_due - _now)
+                _lag.append(max(0.0, perf_counter() - _due))
+            _begin = perf_counter()
+            await self.handle_event(bot, _event)
+            _latency.append(perf_counter() - _begin)
+        _elapsed = perf_counter() - _start
+        _latency.sort()
+        _percentiles = {f"p{q}": percentile(_latency, q) for q in (50, 90, 99, 99.9)}
+        _percentiles["max"] = _latency[-1] if _latency else 0.0
+        return {
+            "events": len(events),
+            "elapsed": _elapsed,
+            "throughput": len(events) / _elapsed if _elapsed else 0.0,
+            "latency": _percentiles,
+            "schedule_lag_max": max(_lag, default=0.0),
+            "triggered": dict(self.triggered),
+        }
+
+
+def main() -> None:
+    _parser = ArgumentParser(prog="python -m benchmarks.replay")
+    _parser.add_argument("stream", type=Path, nargs="?", default=None)
+    _parser.add_argument("--rate", type=float, default=0, help="events/s, 0 = flat out")
+    _parser.add_argument("--synthesize", type=int, default=100000)
+    _parser.add_argument("--groups", type=int, default=10000)
+    _parser.add_argument("--services", nargs="+", default=list(_data.SERVICES[:8]))
+    _parser.add_argument("--level", type=int, default=None)
+    _parser.add_argument("--policy", type=int, default=0)
+    _parser.add_argument("--record", type=Path, default=None)
+    _parser.add_argument("--json", type=Path, default=None)
+    _args = _parser.parse_args()
+
+    if _args.stream is None:
+        _payloads = list(synthesize(_args.synthesize, _args.groups))
+        if _args.record:
+            with open(_args.record, "w", encoding="utf-8") as f:
+                f.writelines(f"{dumpJsonS(i)}\n" for i in _payloads)
+    else:
+        _payloads = list(read_stream(_args.stream))
+
+    _savedata = mkdtemp(prefix="rauthman-replay-")
+    _data.write(_savedata, _args.groups)
+    RAM = _bootstrap.init(
+        savedata=_savedata, log_level="ERROR", ram_metrics=True, ram_policy=_args.policy
+    )
+    _bot = _bootstrap.make_bot()
+    _events = [_bootstrap.make_event(i) for i in _payloads]
+    _replay = Replay(_args.services, _args.level)
+    _report = asyncio.run(_replay.run(_bot, _events, _args.rate))
+    _report["decisions"] = dict(RAM.metrics.decisions)
+    _report["rule_seconds_mean"] = {
+        k: v.sum / v.count for k, v in RAM.metrics.latency.items() if v.count
+    }
+
+    print(
+        f"{_report['events']} events in {_report['elapsed']:.2f}s, "
+        f"{_report['throughput']:.0f} events/s"
+    )
+    print(
+        "latency "
+        + " ".join(f"{k}={v * 1e6:.1f}μs" for k, v in _report["latency"].items())
+    )
+    if _args.rate:
+        print(f"schedule lag max={_report['schedule_lag_max'] * 1e3:.1f}ms")
+    _total = sum(_report["decisions"].values()) or 1
+    print(
+        "decisions "
+        + " ".join(
+            f"{k}={v} ({v / _total:.1%})" for k, v in _report["decisions"].items()
+        )
+    )
+    print(
+        "rule mean "
+        + " ".join(
+            f"{k}={v * 1e6:.1f}μs" for k, v in _report["rule_seconds_mean"].items()
+        )
+    )
+    if _args.json:
+        _args.json.write_text(dumpJsonS(_report, indent=4), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+###   Benchmarks - 综合基准
+-     在 1k, 10k, 100k 个群聊的合成存档上测量 `isInService` 吞吐量、`check_universal` 延迟、
+      `set_universal_bulk` 开销、冷加载、`save_job` 写入与内存峰值。
+-     每种规模在独立的子进程中运行，互不影响，结果以 JSON 写入，便于在版本之间比较。
+-     用法：在仓库根目录执行 `python -m benchmarks.suite [--groups 1000 10000] [--rounds N] [--json 文件]`
+-     结果默认写入当前目录下的 `benchmark.json`，格式与 pytest-benchmark 的 `--benchmark-json` 相近。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import platform
+import tracemalloc
+from argparse import SUPPRESS, ArgumentParser
+from datetime import datetime, timezone
+from pathlib import Path
+from random import Random
+from statistics import mean, median, pstdev
+from subprocess import run
+from sys import executable
+from tempfile import mkdtemp
+from time import perf_counter_ns
+from typing import Optional
+
+from ujson import dumps as dumpJsonS
+from ujson import loads as loadJsonS
+
+from . import _bootstrap, _data
+from ._events import group_message
+
+SIZES = (1000, 10000, 100000)
+"""默认测量的存档规模"""
+
+SAMPLE = 1000
+"""每轮测量中随机抽取的群聊数量"""
+
+
+def stats(samples: list[int], per_round: int = 1) -> dict:
+    """
+    Summarise samples of nanoseconds the way pytest-benchmark does, in seconds.
+
+    Each sample covers `per_round` operations, so `ops` is operations per second.
+    """
+    _seconds = [i / 1e9 / per_round for i in samples]
+    _mean = mean(_seconds)
+    return {
+        "min": min(_seconds),
+        "max": max(_seconds),
+        "mean": _mean,
+        "median": median(_seconds),
+        "stddev": pstdev(_seconds),
+        "rounds": len(_seconds),
+        "ops": 1 / _mean if _mean else 0.0,
+    }
+
+
+class Suite:
+    """
+    ##    Suite - 单个规模的基准
+    -     在当前进程中生成存档并加载插件，因此每个进程只能运行一个规模。
+    """
+
+    def __init__(self, count: int, rounds: int) -> None:
+        self.count = count
+        self.rounds = rounds
+        self.results: list[dict] = []
+        _savedata = mkdtemp(prefix="rauthman-bench-")
+        _data.write(_savedata, count)
+        _start = perf_counter_ns()
+        self.RAM = _bootstrap.init(savedata=_savedata, log_level="ERROR")
+        self.record("plugin_load", [perf_counter_ns() - _start])
+        self.amc = self.RAM._amc
+        self.bot = _bootstrap.make_bot()
+        _random = Random(count)
+        self.sample = _random.sample(_data.group_ids(count), min(SAMPLE, count))
+        self.checks = [
+            _bootstrap.checker(self.RAM.isInService(i)) for i in _data.SERVICES
+        ]
+
+    def record(
+        self, name: str, samples: list[int], per_round: int = 1, **extra
+    ) -> None:
+        self.results.append(
+            {
+                "group": f"{self.count}",
+                "name": name,
+                "params": {"groups": self.count},
+                "stats": stats(samples, per_round) if samples else None,
+                "extra_info": extra,
+            }
+        )
+
+    async def is_in_service(self) -> None:
+        _events = [
+            _bootstrap.make_event(group_message(group_id=i)) for i in self.sample
+        ]
+        _check = self.checks[0]
+        _decisions = self.RAM._decisions
+        _samples = []
+        for _ in range(self.rounds):
+            _start = perf_counter_ns()
+            for _event in _events:
+                await _check(self.bot, _event)
+                _decisions.pop(id(_event), None)
+            _samples.append(perf_counter_ns() - _start)
+        self.record("is_in_service", _samples, len(_events))
+
+    def check_universal(self) -> None:
+        _check = self.amc.check_universal
+        _samples = []
+        for _ in range(self.rounds):
+            _start = perf_counter_ns()
+            for group_id in self.sample:
+                _check(self.bot, group_id, "sv0")
+            _samples.append(perf_counter_ns() - _start)
+        self.record("check_universal", _samples, len(self.sample))
+
+    def set_universal_bulk(self) -> None:
+        _group_ids = self.sample[:100]
+        _samples = []
+        for i in range(self.rounds):
+            _services = [self.RAM._opt.rm if i % 2 else self.RAM._opt.add, "sv1"]
+            _start = perf_counter_ns()
+            self.amc.set_universal_bulk(self.bot, _group_ids, _services)
+            _samples.append(perf_counter_ns() - _start)
+        self.record("set_universal_bulk", _samples, batch=len(_group_ids))
+
+    def cold_load(self) -> None:
+        _samples = []
+        for _ in range(max(1, self.rounds // 10)):
+            _start = perf_counter_ns()
+            self.amc.reload(full=True)
+            _samples.append(perf_counter_ns() - _start)
+        self.record("cold_load", _samples)
+
+    async def save_job(self) -> None:
+        _queue = self.RAM.FileStation.save_queue
+        _samples = []
+        _written = _queue.flushed_bytes
+        for i in range(self.rounds):
+            self.amc.set_universal(self.bot, self.sample[i % len(self.sample)], level=i)
+            _start = perf_counter_ns()
+            await self.RAM.FileStation.save_job()
+            _samples.append(perf_counter_ns() - _start)
+        self.record(
+            "save_job",
+            _samples,
+            bytes_per_flush=(_queue.flushed_bytes - _written) // self.rounds,
+        )
+
+    def peak_memory(self) -> None:
+        tracemalloc.start()
+        self.amc.reload(full=True)
+        _, _peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.record("peak_memory", [], peak_bytes=_peak, max_rss=max_rss())
+
+    async def run(self) -> list[dict]:
+        await self.is_in_service()
+        self.check_universal()
+        self.set_universal_bulk()
+        await self.save_job()
+        self.cold_load()
+        self.peak_memory()
+        return self.results
+
+
+def max_rss() -> Optional[int]:
+    """
+    Peak resident set size of this process in bytes, `None` where `resource` is unavailable.
+    """
+    try:
+        from resource import RUSAGE_SELF, getrusage
+    except ImportError:
+        return None
+    _rss = getrusage(RUSAGE_SELF).ru_maxrss
+    return _rss if platform.system() == "Darwin" else _rss * 1024
+
+
+def version() -> Optional[str]:
+    try:
+        from importlib.metadata import PackageNotFoundError
+        from importlib.metadata import version as _version
+    except ImportError:
+        return None
+    try:
+        return _version("nonebot_plugin_rauthman")
+    except PackageNotFoundError:
+        return None
+
+
+def machine_info() -> dict:
+    return {
+        "python_implementation": platform.python_implementation(),
+        "python_version": platform.python_version(),
+        "system": platform.system(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def main() -> None:
+    _parser = ArgumentParser(prog="python -m benchmarks.suite")
+    _parser.add_argument("--groups", type=int, nargs="+", default=list(SIZES))
+    _parser.add_argument("--rounds", type=int, default=20)
+    _parser.add_argument("--json", type=Path, default=Path("benchmark.json"))
+    _parser.add_argument("--child", action="store_true", help=SUPPRESS)
+    _args = _parser.parse_args()
+    if _args.child:
+        _results = asyncio.run(Suite(_args.groups[0], _args.rounds).run())
+        _args.json.write_text(dumpJsonS(_results), encoding="utf-8")
+        return
+    _benchmarks = []
+    for count in _args.groups:
+        _output = Path(mkdtemp(prefix="rauthman-bench-")) / "results.json"
+        _command = [executable, "-m", "benchmarks.suite", "--child"]
+        _command += ["--groups", f"{count}", "--rounds", f"{_args.rounds}"]
+        run(_command + ["--json", f"{_output}"], check=True)
+        _benchmarks += loadJsonS(_output.read_text(encoding="utf-8"))
+    print(f"{'groups':>8} {'benchmark':<20} {'mean':>12} {'ops':>14}")
+    for i in _benchmarks:
+        if i["stats"]:
+            _mean, _ops = (
+                f"{i['stats']['mean'] * 1e6:.2f} μs",
+                f"{i['stats']['ops']:.0f}",
+            )
+        else:
+            _mean, _ops = f"{i['extra_info']['peak_bytes'] / 1048576:.1f} MiB", ""
+        print(f"{i['group']:>8} {i['name']:<20} {_mean:>12} {_ops:>14}")
+    _report = {
+        "machine_info": machine_info(),
+        "version": version(),
+        "datetime": datetime.now(timezone.utc).isoformat(),
+        "benchmarks": _benchmarks,
+    }
+    _args.json.write_text(dumpJsonS(_report, indent=4), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
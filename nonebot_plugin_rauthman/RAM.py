@@ -1,9 +1,15 @@
 from __future__ import annotations
 
+from asyncio import Queue, Task, get_running_loop, sleep
+from bisect import bisect_left, bisect_right, insort
 from dataclasses import dataclass, field, fields
+from collections.abc import MutableMapping
+from contextlib import nullcontext
 from functools import wraps
+from operator import attrgetter
 from pathlib import Path
-from typing import Optional, Union
+from time import perf_counter
+from typing import Callable, Iterator, NamedTuple, Optional, Union
 
 from nonebot import get_driver
 from nonebot.adapters import Bot, Event, Message, MessageTemplate
@@ -28,7 +34,9 @@ from nonebot.adapters.onebot.v11 import (
     LuckyKingNotifyEvent as OneBot_V11_LuckyKingNotifyEvent,
     PokeNotifyEvent as OneBot_V11_PokeNotifyEvent,
 )
+from nonebot.drivers import URL, ASGIMixin, HTTPServerSetup, Request, Response
 from nonebot.exception import ActionFailed
+from nonebot.message import event_postprocessor
 from nonebot.params import CommandArg
 from nonebot.permission import SUPERUSER, Permission
 from nonebot.plugin import PluginMetadata, on_command
@@ -38,7 +46,20 @@ from nonebot.utils import logger_wrapper
 from ujson import dumps as dumpJsonS
 from ujson import loads as loadJsonS
 
-from ._FileStation import FileStation, generate_savedata_path
+from ._FileStation import (
+    FileJournal,
+    FileLock,
+    FileStation,
+    LazyMapping,
+    atomic_write,
+    deep_sizeof,
+    generate_savedata_path,
+    get_serializer,
+    load_bytes,
+    serializers,
+)
+from ._Metrics import Metrics
+from ._Storage import open_backend
 
 log = logger_wrapper(Path(__file__).stem)
 _config = get_driver().config
@@ -52,6 +73,23 @@ class Config:
     ram_rm: str = getattr(_config, "ram_rm", "-r") or "-r"
     ram_show: str = getattr(_config, "ram_show", "-s") or "-s"
     ram_available: str = getattr(_config, "ram_available", "-v") or "-v"
+    ram_query: str = getattr(_config, "ram_query", "-q") or "-q"
+    ram_level: str = getattr(_config, "ram_level", "-l") or "-l"
+    ram_page_size: int = getattr(_config, "ram_page_size", 20) or 20
+    ram_move: str = getattr(_config, "ram_move", "-m") or "-m"
+    ram_batch_size: int = getattr(_config, "ram_batch_size", 256) or 256
+    ram_stats: str = getattr(_config, "ram_stats", "-t") or "-t"
+    ram_journal_limit: int = getattr(_config, "ram_journal_limit", 1048576) or 1048576
+    ram_storage: str = getattr(_config, "ram_storage", "json") or "json"
+    ram_format: str = getattr(_config, "ram_format", "pretty") or "pretty"
+    ram_lazy: bool = getattr(_config, "ram_lazy", False) or False
+    ram_compact: bool = getattr(_config, "ram_compact", False) or False
+    ram_multiprocess: bool = getattr(_config, "ram_multiprocess", False) or False
+    ram_watch_interval: float = getattr(_config, "ram_watch_interval", 2.0) or 2.0
+    ram_metrics: bool = getattr(_config, "ram_metrics", False) or False
+    ram_metrics_path: str = (
+        getattr(_config, "ram_metrics_path", "/ram/metrics") or "/ram/metrics"
+    )
 
 
 config = Config()
@@ -87,9 +125,26 @@ class Options:
     -     rm: str  禁用功能
     -     show: str  展示群功能状态
     -     available: str  展示全局可用功能
+    -     query: str  查询启用了某个功能的群聊
+    -     level: str  查询级别不低于某个值的群聊
+    -     `page_size`: int  查询结果每页的群聊数量
+
+    ###   参数 - 根据服务级别
+    -     move: str  将某个级别的群聊整体调整到另一个级别
+
+    ###   参数 - 写入
+    -     `batch_size`: int  写入方一次最多合并提交的修改数量
+
+    ###   参数 - 指标
+    -     stats: str  展示运行指标
+    -     metrics: bool  是否记录运行指标
+    -     `metrics_path`: str  以 Prometheus 文本格式导出运行指标的 HTTP 路径
     """
 
-    filepath: str = Path(generate_savedata_path()) / "global.json"
+    filepath: str = (
+        Path(generate_savedata_path())
+        / f"global{get_serializer(config.ram_format).suffix}"
+    )
     permission: Permission = SUPERUSER
     policy: int = config.ram_policy
     cmd: str = config.ram_cmd
@@ -97,24 +152,480 @@ class Options:
     rm: str = config.ram_rm
     show: str = config.ram_show
     available: str = config.ram_available
+    query: str = config.ram_query
+    level: str = config.ram_level
+    page_size: int = config.ram_page_size
+    move: str = config.ram_move
+    batch_size: int = config.ram_batch_size
+    stats: str = config.ram_stats
+    journal_limit: int = config.ram_journal_limit
+    storage: str = config.ram_storage
+    format: str = config.ram_format
+    lazy: bool = config.ram_lazy
+    compact: bool = config.ram_compact
+    multiprocess: bool = config.ram_multiprocess
+    watch_interval: float = config.ram_watch_interval
+    metrics: bool = config.ram_metrics
+    metrics_path: str = config.ram_metrics_path
 
 
 _opt = Options()
 
+LOCK_RETRY = 0.01
+"""写入方未能获取 `ram_multiprocess` 的文件锁时，再次尝试前等待的秒数"""
+
+
+class ServiceRegistry:
+    """
+    ###   RAM - 功能注册表
+    -     将每个功能名称固定映射为一个比特位，群聊的启用与禁用功能在内存中以整数位掩码保存
+    -     通过 `isInService` 注册的功能为全局可用功能，其余功能名称仅在读取存档时被收录
+    """
+
+    def __init__(self) -> None:
+        self._bits: dict[str, int] = {}
+        self._names: list[str] = []
+        self.available: list[str] = []
+        self.available_mask: int = 0
+
+    def intern(self, service: str) -> int:
+        """
+        Return the bit of `service`, assigning the next free one on first sight.
+        """
+        _bit = self._bits.get(service)
+        if _bit is None:
+            _bit = 1 << len(self._names)
+            self._bits[service] = _bit
+            self._names.append(service)
+        return _bit
+
+    def bit(self, service: str) -> int:
+        """
+        Return the bit of `service` without interning it, `0` if unknown.
+        """
+        return self._bits.get(service, 0)
+
+    def register(self, service: str) -> int:
+        _bit = self.intern(service)
+        if not self.available_mask & _bit:
+            self.available_mask |= _bit
+            self.available.append(service)
+        return _bit
+
+    def is_available(self, service: str) -> bool:
+        return bool(self.available_mask & self.bit(service))
+
+    def mask(self, services) -> int:
+        _mask = 0
+        for service in services:
+            _mask |= self.intern(service)
+        return _mask
+
+    def names(self, mask: int) -> list[str]:
+        """
+        Decode a mask back to a sorted list of service names.
+        """
+        _names = []
+        _index = 0
+        while mask:
+            if mask & 1:
+                _names.append(self._names[_index])
+            mask >>= 1
+            _index += 1
+        _names.sort()
+        return _names
+
+
+registry = ServiceRegistry()
+available = registry.available
+
+
+class GroupRecord(NamedTuple):
+    """
+    ###   RAM - 群聊授权记录
+    -     由 `self.data` 中的群聊数据编译而来，只读，供 Rule 直接查询
+
+    ###   参数
+    -     enabled: int  已启用功能的位掩码
+    -     disabled: int  已禁用功能的位掩码
+    -     level: int  服务级别
+    """
+
+    enabled: int = 0
+    disabled: int = 0
+    level: int = 0
+
+
+def _bits(mask: int) -> Iterator[int]:
+    while mask:
+        _bit = mask & -mask
+        yield _bit
+        mask ^= _bit
+
+
+class GroupIndex(MutableMapping):
+    """
+    ###   RAM - 群聊记录索引
+    -     群号到 GroupRecord 的映射
+    -     同时维护功能与级别到群号的倒排索引，写入记录时自动更新，查询无需遍历所有群聊
+
+    ###   属性
+    -     enabled: dict[int, set[int]]  功能的位到启用了该功能的群号
+    -     disabled: dict[int, set[int]]  功能的位到禁用了该功能的群号
+    -     levels: dict[int, set[int]]  级别到该级别的群号
+    -     sorted_levels: list[int]  `levels` 中出现的级别，升序排列，供范围查询二分查找
+    """
+
+    __slots__ = ("_records", "enabled", "disabled", "levels", "sorted_levels", "_owned")
+
+    def __init__(self) -> None:
+        self._records: dict[int, GroupRecord] = {}
+        self.enabled: dict[int, set[int]] = {}
+        self.disabled: dict[int, set[int]] = {}
+        self.levels: dict[int, set[int]] = {}
+        self.sorted_levels: list[int] = []
+        self._owned: set[int] = set()
+
+    def copy(self) -> GroupIndex:
+        """
+        ###   GroupIndex - 复制
+        -     返回一个可以独立修改的副本，倒排索引中的群号集合在副本第一次修改它时才复制
+        """
+        _copy = GroupIndex.__new__(GroupIndex)
+        _copy._records = dict(self._records)
+        _copy.enabled = dict(self.enabled)
+        _copy.disabled = dict(self.disabled)
+        _copy.levels = dict(self.levels)
+        _copy.sorted_levels = list(self.sorted_levels)
+        _copy._owned = set()
+        return _copy
+
+    def _own(self, inverted: dict[int, set[int]], key: int) -> set[int]:
+        """
+        Return the set of `key` in `inverted`, copied first unless this index
+        created it, since a set may still be shared with the index it was copied from.
+        """
+        _set = inverted.get(key)
+        if _set is None or id(_set) not in self._owned:
+            _set = inverted[key] = set(_set or ())
+            self._owned.add(id(_set))
+        return _set
+
+    def get(
+        self, group_id: int, default: Optional[GroupRecord] = None
+    ) -> Optional[GroupRecord]:
+        return self._records.get(group_id, default)
+
+    def __getitem__(self, group_id: int) -> GroupRecord:
+        return self._records[group_id]
+
+    def __setitem__(self, group_id: int, record: GroupRecord) -> None:
+        if group_id in self._records:
+            self._unlink(group_id, self._records[group_id])
+        self._records[group_id] = record
+        for _bit in _bits(record.enabled):
+            self._own(self.enabled, _bit).add(group_id)
+        for _bit in _bits(record.disabled):
+            self._own(self.disabled, _bit).add(group_id)
+        if record.level not in self.levels:
+            insort(self.sorted_levels, record.level)
+        self._own(self.levels, record.level).add(group_id)
+
+    def __delitem__(self, group_id: int) -> None:
+        self._unlink(group_id, self._records.pop(group_id))
+
+    def _unlink(self, group_id: int, record: GroupRecord) -> None:
+        for _inverted, _keys in (
+            (self.enabled, _bits(record.enabled)),
+            (self.disabled, _bits(record.disabled)),
+            (self.levels, (record.level,)),
+        ):
+            for _key in _keys:
+                _set = self._own(_inverted, _key)
+                _set.discard(group_id)
+                if not _set:
+                    del _inverted[_key]
+        if record.level not in self.levels:
+            del self.sorted_levels[bisect_left(self.sorted_levels, record.level)]
+
+    def __contains__(self, group_id: object) -> bool:
+        return group_id in self._records
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._records)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def with_service(self, service: str, *, enabled: bool = True) -> set[int]:
+        """
+        ###   GroupIndex - 按功能查询
+        -     返回启用（或禁用）了某个功能的群号
+        """
+        _inverted = self.enabled if enabled else self.disabled
+        return set(_inverted.get(registry.bit(service), ()))
+
+    def at_level(
+        self, min_level: Optional[int] = None, max_level: Optional[int] = None
+    ) -> set[int]:
+        """
+        ###   GroupIndex - 按级别查询
+        -     返回级别在 [min_level, max_level] 之间的群号，未指定的一端不设限
+        """
+        _start = 0 if min_level is None else bisect_left(self.sorted_levels, min_level)
+        _stop = (
+            len(self.sorted_levels)
+            if max_level is None
+            else bisect_right(self.sorted_levels, max_level)
+        )
+        _result = set()
+        for _level in self.sorted_levels[_start:_stop]:
+            _result |= self.levels[_level]
+        return _result
+
+    def level(self, group_id: int) -> int:
+        """
+        ###   GroupIndex - 查询级别
+        -     返回群聊的服务级别，未注册的群聊为 0
+        """
+        _record = self._records.get(group_id)
+        return _record.level if _record else 0
+
+
+class Mutation(NamedTuple):
+    """
+    ###   RAM - 一次修改
+    -     由 `set_universal` 等方法或 `RAM_Control.submit` 生成，交给写入方统一提交
+
+    ###   参数
+    -     adapter: str  适配器在数据中的键
+    -     group_ids: list[int]  群号
+    -     services: Optional[list[str]]  `-a sv1 sv2` 或 `-r sv1 sv2`，为空时设置级别
+    -     level: Optional[int]  服务级别
+    """
+
+    adapter: str
+    group_ids: list[int]
+    services: Optional[list[str]] = None
+    level: Optional[int] = None
+
+
+def migrate_savedata(filepath: Path) -> None:
+    """
+    Move a save written under another extension to `filepath`, journal included.
+
+    Switching `ram_format` between `binary` and the JSON formats changes the
+    extension of the save, so the old file is re-encoded in the new format
+    and removed; its journal is carried over unchanged.
+    """
+    if filepath.exists():
+        return
+    for suffix in {i.suffix for i in serializers.values()} - {filepath.suffix}:
+        _old = filepath.with_suffix(suffix)
+        if not _old.exists():
+            continue
+        with open(_old, "rb") as f:
+            _data = load_bytes(f.read(), _old)
+        atomic_write(filepath, get_serializer(_opt.format).dumps(_data))
+        _journal = Path(f"{_old}.journal")
+        if _journal.exists():
+            _journal.replace(f"{filepath}.journal")
+        _old.unlink()
+        log("INFO", f"Migrated {_old.name} to {filepath.name}")
+        return
+
 
 class RAM_Control(FileStation):
     def __init__(self, *args, **kwargs) -> None:
-        super().__init__(_opt.filepath, RAM().module_name, *args, **kwargs)
+        self._mutations: Optional[Queue] = None
+        self._writer: Optional[Task] = None
+        self._index: dict[str, GroupIndex] = {}
+        self._partial: set[str] = set()
+        self.generation: int = 0
+        migrate_savedata(_opt.filepath)
+        self._journal = FileJournal(_opt.filepath)
+        self._lock = FileLock(_opt.filepath) if _opt.multiprocess else None
+        self._stamp = None
+        self._backend = open_backend(
+            _opt.storage,
+            _opt.filepath,
+            {v: k for k, v in self._compatible_adapters.items()},
+        )
+        kwargs.setdefault("serializer", _opt.format)
+        kwargs.setdefault("lazy", _opt.lazy)
+        super().__init__(
+            _opt.filepath, RAM().module_name, *args, track_dirty=4, **kwargs
+        )
+        FileStation.save_queue.critical.add(self._filepath)
 
     def load(self) -> dict:
         super().load()
         self.standardize()
+        self.replay_journal()
+        self.migrate_to_backend()
+        self.build_index()
+        if _opt.compact:
+            self.compact()
         return self.data
 
     def reload(self, *, full: bool = False) -> None:
         super().reload(full=full)
         self.standardize()
 
+    def replay_journal(self) -> None:
+        """
+        Re-apply the changes journaled since `global.json` was last written.
+
+        Every entry is an idempotent assignment, so replaying over data that
+        already contains some of them is harmless.
+        """
+        _count = 0
+        for entry in self._journal.replay():
+            _groups = getattr(self, entry["adapter"])["group"]
+            if not entry["group"] in _groups:
+                _groups[entry["group"]] = {}
+            self._apply(_groups[entry["group"]], entry["op"], entry["value"])
+            _count += 1
+        if _count:
+            log("INFO", f"Replayed {_count} journaled changes")
+            self._update(self._module_name, self.data)
+            self.save()
+            super().reload()
+            self.standardize()
+
+    def refresh(self) -> bool:
+        """
+        Reload everything from disk if another process has committed a change
+        since this one last loaded or changed the data, see `ram_multiprocess`.
+
+        Must be called with `self._lock` held. Returns whether it reloaded.
+        """
+        if self._lock.generation() == self._lock.known:
+            return False
+        log("INFO", "Reloading changes committed by another process")
+        if self._backend is not None:
+            self._backend.refresh()
+        self.reload(full=True)
+        return True
+
+    async def watch(self) -> None:
+        """
+        Scheduled job of `ram_multiprocess`. A `stat` of the lock file is all it
+        costs while no other process commits anything.
+
+        A coroutine, so the scheduler runs it on the event loop rather than in a
+        worker thread, and a reload never races the rule checks reading the index.
+        The lock is only tried: while a flush of this process or another process
+        holds it, the check is left to the next tick instead of stalling the loop.
+        """
+        _stamp = self._lock.stamp()
+        if _stamp == self._stamp:
+            return
+        with self._lock.acquire(blocking=False) as _acquired:
+            if not _acquired:
+                return
+            self._stamp = _stamp
+            self.refresh()
+
+    def migrate_to_backend(self) -> None:
+        """
+        Copy the groups of `global.json` into an empty storage backend.
+
+        `global.json` itself is left untouched, it is simply no longer written
+        while a storage backend is in use.
+        """
+        if self._backend is None or not self._backend.is_empty():
+            return
+        _count = 0
+        for _adapter in RAM_Control._compatible_adapters.values():
+            _records = self._backend.records(_adapter, "group")
+            for k, v in getattr(self, _adapter).get("group", {}).items():
+                _records[k] = v
+                _count += 1
+        self._backend.commit()
+        if _count:
+            log("INFO", f"Migrated {_count} groups to {_opt.storage}")
+
+    def groups(self: RAM_Control, adapter: str) -> MutableMapping[str, dict]:
+        """
+        Return the groups of `adapter`, either the dict inside `self.data` or the
+        mapping of the storage backend. A group read from a backend is a copy, so
+        it has to be assigned back after being changed.
+        """
+        if self._backend is None:
+            return getattr(self, adapter)["group"]
+        return self._backend.records(adapter, "group")
+
+    @staticmethod
+    def _apply(home: dict, op: str, value: Union[list[str], int, None]) -> None:
+        """
+        Apply one change to the data of a group.
+
+        `op` is `add` or `rm` with a list of services as `value`, or `level`.
+        """
+        if op == "level":
+            home["level"] = value
+            return
+        _record = RAM_Control._compile_group(home)
+        _enabled = _record.enabled
+        _disabled = _record.disabled
+        _mask = registry.mask(value)
+        if op == "add":
+            _enabled |= _mask
+            _disabled &= ~_mask
+            home["enabled"] = registry.names(_enabled)
+            if _disabled:
+                home["disabled"] = registry.names(_disabled)
+            elif "disabled" in home:
+                del home["disabled"]
+        elif op == "rm":
+            _disabled |= _mask
+            _enabled &= ~_mask
+            home["disabled"] = registry.names(_disabled)
+            if _enabled:
+                home["enabled"] = registry.names(_enabled)
+            elif "enabled" in home:
+                del home["enabled"]
+
+    def build_index(self) -> None:
+        """
+        Compile every group of every compatible adapter into `self._index`.
+
+        The index is keyed by adapter and integer group id, so a rule check is a
+        single dict lookup instead of walking `self.data`. It also keeps the
+        inverted indexes behind `find_groups`.
+
+        Groups that are still lazily decoded (see `ram_lazy`) or stored in a lazy
+        backend (see `ram_storage`) are left out, and compiled by `get_record` the
+        first time they are looked up instead.
+
+        The new index is built aside and published by a single assignment, so a
+        reader sees either the old index or the complete new one.
+        """
+        _index = {}
+        _partial = set()
+        for _adapter in RAM_Control._compatible_adapters.values():
+            _groups = self.groups(_adapter)
+            _index[_adapter] = GroupIndex()
+            if isinstance(_groups, LazyMapping) or getattr(
+                self._backend, "lazy", False
+            ):
+                _partial.add(_adapter)
+                continue
+            for k, v in _groups.items():
+                _index[_adapter][int(k)] = self._compile_group(v)
+        self._partial = _partial
+        self._index = _index
+        self.generation += 1
+
+    @staticmethod
+    def _compile_group(home: dict) -> GroupRecord:
+        return GroupRecord(
+            enabled=registry.mask(home.get("enabled", ())),
+            disabled=registry.mask(home.get("disabled", ())),
+            level=home.get("level") or 0,
+        )
+
     def standardize(self) -> None:
         if not self.check_keys():
             if not self._get("RAM"):
@@ -148,18 +659,35 @@ class RAM_Control(FileStation):
 
         Then apply changes to the particular `module_name` dictionary in `self._data`.
 
-        Finally, save the changes.
+        Finally, save the changes. The changes are already durable in the journal,
+        so the save is only queued, unless the journal has outgrown `ram_journal_limit`
+        and has to be folded into the file right away.
+
+        With a storage backend the changes are committed by the backend instead.
         """
 
         @wraps(func)
         def wrapper(self: RAM_Control, *args, **kwargs) -> None:
             func(self, *args, **kwargs)
-            self._update(self._module_name, self.data)
-            self.save()
-            self.reload()
+            self._applied()
 
         return wrapper
 
+    def _applied(self: RAM_Control, *, fold: bool = True) -> None:
+        """
+        The tail of `applicator`, run after every commit. Without `fold`, an
+        outgrown journal is left for the caller to fold into the file.
+        """
+        if self._backend is not None:
+            return
+        if self._get(self._module_name) is not self.data:
+            self._update(self._module_name, self.data)
+        self.save()
+        if fold and self._journal.size() > _opt.journal_limit:
+            if self.do_save_safe():
+                FileStation.save_queue.discard(self._filepath)
+        self.reload()
+
     def convert_from_legacy(self) -> None:
         _path = Path(generate_savedata_path()) / "auth.json"
         _fs = FileStation(_path)
@@ -175,11 +703,11 @@ class RAM_Control(FileStation):
         OneBot_V11_Adapter.get_name(): "onebot_v11",
     }
 
-    def _check_adapter(self, bot: Bot) -> bool:
-        if bot.type in self._compatible_adapters:
-            self._base = getattr(self, RAM_Control._compatible_adapters[bot.type])
-            return True
-        return False
+    def _check_adapter(self, bot: Bot) -> Optional[str]:
+        """
+        Return the data key of the adapter of `bot`, `None` if it is unsupported.
+        """
+        return self._compatible_adapters.get(bot.type)
 
     @applicator
     def set_universal(
@@ -189,84 +717,385 @@ class RAM_Control(FileStation):
         services: Optional[list[str]] = None,
         level: Optional[int] = None,
     ) -> None:
-        if self._check_adapter(bot):
-            _groups = self._base["group"]
-            if not f"{group_id}" in _groups:
-                _groups[f"{group_id}"] = {}
-            _home = _groups[f"{group_id}"]
-            if services:
-                cache = loadJsonS(dumpJsonS(services))
-                if not "enabled" in _home:
-                    _home["enabled"] = []
-                if not "disabled" in _home:
-                    _home["disabled"] = []
-                _enabled = _home["enabled"]
-                _disabled = _home["disabled"]
-                if cache[0] == _opt.add:
-                    cache.remove(_opt.add)
-                    _valid = True
-                    for service in cache:
-                        if not service in available:
-                            _valid = False
-                    if _valid:
-                        _enabled += cache
-                        for service in _disabled:
-                            if service in _enabled:
-                                _disabled.remove(service)
-                    if not _disabled:
-                        del _home["disabled"]
-                elif cache[0] == _opt.rm:
-                    cache.remove(_opt.rm)
-                    _valid = True
-                    for service in cache:
-                        if not service in available:
-                            _valid = False
-                    if _valid:
-                        _disabled += cache
-                        for service in _enabled:
-                            if service in _disabled:
-                                _enabled.remove(service)
-                    if not _enabled:
-                        del _home["enabled"]
-                if "enabled" in _home:
-                    _home["enabled"] = list(set(_enabled))
-                    _home["enabled"].sort()
-                if "disabled" in _home:
-                    _home["disabled"] = list(set(_disabled))
-                    _home["disabled"].sort()
+        self._commit([self._mutation(bot, [group_id], services, level)])
+
+    @applicator
+    def set_universal_bulk(
+        self: RAM_Control,
+        bot: Bot,
+        group_ids: list[int],
+        services: Optional[list[str]] = None,
+        level: Optional[int] = None,
+    ) -> None:
+        """
+        Apply the same change to every group in `group_ids` as one transaction.
+
+        The groups are mutated and re-indexed one by one, then the document is
+        sorted, queued for saving and reloaded only once for the whole batch.
+        """
+        self._commit([self._mutation(bot, group_ids, services, level)])
+
+    async def move_level(
+        self: RAM_Control,
+        bot: Bot,
+        from_level: int,
+        to_level: int,
+        *,
+        max_level: Optional[int] = None,
+    ) -> int:
+        """
+        Move every group at `from_level` to `to_level` as one transaction, and
+        return how many groups were moved.
+
+        With `max_level`, every group within `[from_level, max_level]` is moved.
+        The groups are found by `find_groups`, nothing else is walked, and the
+        change goes through the writer like any other, see `submit`.
+        """
+        if self._check_adapter(bot) is None:
+            return 0
+        _group_ids = self.find_groups(
+            bot,
+            min_level=from_level,
+            max_level=from_level if max_level is None else max_level,
+        )
+        if _group_ids:
+            await self.submit(bot, _group_ids, level=to_level)
+        return len(_group_ids)
+
+    async def submit(
+        self: RAM_Control,
+        bot: Bot,
+        group_ids: list[int],
+        services: Optional[list[str]] = None,
+        level: Optional[int] = None,
+    ) -> None:
+        """
+        Queue a change for the writer task and wait until it is committed.
+
+        Changes submitted while the writer is busy are committed together as one
+        batch, see `write_mutations`.
+        """
+        _mutation = self._mutation(bot, group_ids, services, level)
+        if _mutation is None:
+            return
+        _loop = get_running_loop()
+        if self._writer is None or self._writer.done():
+            self._mutations = Queue()
+            self._writer = _loop.create_task(self.write_mutations())
+        _future = _loop.create_future()
+        self._mutations.put_nowait((_mutation, _future))
+        await _future
+
+    async def write_mutations(self: RAM_Control) -> None:
+        """
+        The single writer. Every change submitted by `submit` is applied here.
+
+        Whatever has queued up meanwhile, up to `ram_batch_size` changes, is taken
+        at once and committed as one transaction, so a burst of changes is saved
+        and reloaded once. Between two batches the event loop is free to run rule
+        checks, which never wait for the writer: they only read `self._index`,
+        whose `GroupRecord`s are immutable and replaced as a whole.
+        """
+        while True:
+            _batch = [await self._mutations.get()]
+            while len(_batch) < _opt.batch_size and not self._mutations.empty():
+                _batch.append(self._mutations.get_nowait())
+            try:
+                await self._write_batch([_mutation for _mutation, _ in _batch])
+            except Exception as e:
+                for _, _future in _batch:
+                    if not _future.done():
+                        _future.set_exception(e)
             else:
-                _home["level"] = level
+                for _, _future in _batch:
+                    if not _future.done():
+                        _future.set_result(None)
+
+    async def _write_batch(self: RAM_Control, mutations: list[Mutation]) -> None:
+        """
+        Commit a batch from the writer task, the way `_commit` does.
+
+        The batch is applied to copies of the indexes it touches, which replace
+        `self._index` in a single assignment, so a rule check sees either none
+        or all of the batch. The journal, the fallback save and a storage
+        backend then write in `FileStation.executor`, off the event loop, and so
+        does folding an outgrown journal into the file.
+
+        With `ram_multiprocess` the file lock has to be held until the batch is
+        on disk, so the batch is committed inline once the lock is free. The
+        lock is only ever tried, so a flush of this process or another process
+        holding it never stalls the event loop.
+        """
+        mutations = [i for i in mutations if i is not None]
+        if not mutations:
+            return
+        _loop = get_running_loop()
+        _executor = FileStation.executor
+        if self._lock:
+            while True:
+                with self._lock.acquire(blocking=False) as _acquired:
+                    if _acquired:
+                        self._commit(mutations)
+                        break
+                await sleep(LOCK_RETRY)
+        else:
+            _index = dict(self._index)
+            for _adapter in {i.adapter for i in mutations} & _index.keys():
+                _index[_adapter] = _index[_adapter].copy()
+            for _mutation in mutations:
+                self._commit_universal(_mutation, _index)
+            self._index = _index
+            if self._backend is not None:
+                await _loop.run_in_executor(_executor, self._backend.prepare_commit())
+            elif not await _loop.run_in_executor(_executor, self._journal.commit):
+                if not await _loop.run_in_executor(
+                    _executor, self.prepare_save(safe=True)
+                ):
+                    raise OSError(f"Failed to persist changes to {self._filepath}")
+            self.generation += 1
+        self._applied(fold=False)
+        if self._backend is None and self._journal.size() > _opt.journal_limit:
+            if await _loop.run_in_executor(_executor, self.prepare_save(safe=True)):
+                FileStation.save_queue.discard(self._filepath)
+
+    def _mutation(
+        self: RAM_Control,
+        bot: Bot,
+        group_ids: list[int],
+        services: Optional[list[str]],
+        level: Optional[int],
+    ) -> Optional[Mutation]:
+        _adapter = self._check_adapter(bot)
+        if _adapter is None:
+            return None
+        return Mutation(_adapter, list(group_ids), services, level)
+
+    def _commit(self: RAM_Control, mutations: list[Optional[Mutation]]) -> None:
+        """
+        Apply `mutations` and make them durable before returning.
+
+        The journal is tried first. If it cannot be written, the whole file is
+        saved right away instead, and if that fails too `OSError` is raised, so
+        a change is never acknowledged without being on disk.
+        """
+        mutations = [i for i in mutations if i is not None]
+        if not mutations:
+            return
+        with self._lock.acquire() if self._lock else nullcontext():
+            if self._lock:
+                self.refresh()
+            for _mutation in mutations:
+                self._commit_universal(_mutation)
+            if self._backend is None:
+                if not self._journal.commit() and not self.do_save_safe():
+                    raise OSError(f"Failed to persist changes to {self._filepath}")
+            else:
+                self._backend.commit()
+            self.generation += 1
+            if self._lock:
+                self._lock.bump()
+
+    def _commit_universal(
+        self: RAM_Control,
+        mutation: Mutation,
+        index: Optional[dict[str, GroupIndex]] = None,
+    ) -> None:
+        """
+        Apply one mutation to every group it names, compiling the groups into
+        `index`, `self._index` by default.
+
+        A changed group is written back as a new dict rather than edited in
+        place, because a snapshot still being written may hold the old one.
+        """
+        _adapter, group_ids, services, level = mutation
+        _groups = self.groups(_adapter)
+        _index = (self._index if index is None else index).setdefault(
+            _adapter, GroupIndex()
+        )
+        if not services:
+            _op, _value = "level", level
+        elif services[0] == _opt.add:
+            _op, _value = "add", services[1:]
+        elif services[0] == _opt.rm:
+            _op, _value = "rm", services[1:]
+        else:
+            _op, _value = None, None
+        if _op != "level" and not all(map(registry.is_available, _value or ())):
+            _value = []
+        for group_id in group_ids:
+            _home = dict(_groups[f"{group_id}"]) if f"{group_id}" in _groups else {}
+            if _op:
+                self._apply(_home, _op, _value)
+            _groups[f"{group_id}"] = _home
+            _index[int(group_id)] = self._compile_group(_home)
+            if self._backend is not None:
+                continue
+            self.mark_dirty(self._module_name, _adapter, "group", f"{group_id}")
+            if _op:
+                self._journal.append(
+                    {
+                        "adapter": _adapter,
+                        "group": f"{group_id}",
+                        "op": _op,
+                        "value": _value,
+                    }
+                )
 
     def check_universal(
         self: RAM_Control, bot: Bot, group_id: int, service: Optional[str] = None
     ) -> Union[bool, int]:
-        if self._check_adapter(bot):
-            _groups = self._base["group"]
-            if not f"{group_id}" in _groups:
-                return 0
-            elif service:
-                if not "enabled" in _groups[f"{group_id}"]:
-                    return 0
-                else:
-                    return bool(service in _groups[f"{group_id}"]["enabled"])
-            elif not "level" in _groups[f"{group_id}"]:
-                return 0
-            else:
-                return _groups[f"{group_id}"]["level"]
-        else:
+        _record = self.get_record(bot, group_id)
+        if _record is None:
             return 0
+        elif service:
+            return bool(_record.enabled & registry.bit(service))
+        else:
+            return _record.level
+
+    def get_record(self: RAM_Control, bot: Bot, group_id: int) -> Optional[GroupRecord]:
+        """
+        Look up the compiled record of a group, `None` if the group or the adapter is unknown.
+        """
+        _adapter = RAM_Control._compatible_adapters.get(bot.type)
+        _index = self._index.get(_adapter)
+        if _index is None:
+            return None
+        if group_id not in _index and _adapter in self._partial:
+            _groups = self.groups(_adapter)
+            if f"{group_id}" in _groups:
+                _index[group_id] = self._compile_group(_groups[f"{group_id}"])
+        return _index.get(group_id)
+
+    def find_groups(
+        self: RAM_Control,
+        bot: Bot,
+        service: Optional[str] = None,
+        *,
+        enabled: bool = True,
+        min_level: Optional[int] = None,
+        max_level: Optional[int] = None,
+    ) -> list[int]:
+        """
+        Return the sorted ids of the groups matching every given criterion:
+        `service` enabled (or disabled, with `enabled=False`), and a level
+        within `[min_level, max_level]`. Without any criterion, all groups.
+
+        Answered from the inverted indexes of `self._index`. An adapter that is
+        still compiled lazily is asked of the storage backend, which answers
+        from its own indexes when it can, see `StorageBackend.find`; otherwise
+        the adapter is compiled in full by its first query.
+        """
+        _adapter = RAM_Control._compatible_adapters.get(bot.type)
+        if _adapter not in self._index:
+            return []
+        if _adapter in self._partial and self._backend is not None:
+            _found = self._backend.find(
+                _adapter,
+                "group",
+                service,
+                enabled=enabled,
+                min_level=min_level,
+                max_level=max_level,
+            )
+            if _found is not None:
+                return sorted(map(int, _found))
+        _index = self._complete_index(_adapter)
+        _result = None
+        if service is not None:
+            _result = _index.with_service(service, enabled=enabled)
+        if min_level is not None or max_level is not None:
+            _levels = _index.at_level(min_level, max_level)
+            _result = _levels if _result is None else _result & _levels
+        return sorted(_index if _result is None else _result)
+
+    def _complete_index(self: RAM_Control, adapter: str) -> GroupIndex:
+        _index = self._index[adapter]
+        if adapter in self._partial:
+            for k, v in self.groups(adapter).items():
+                if int(k) not in _index:
+                    _index[int(k)] = self._compile_group(v)
+            self._partial.discard(adapter)
+        return _index
 
     def show_universal(self: RAM_Control, bot: Bot, group_id: int) -> dict:
         data = {}
-        if self._check_adapter(bot):
-            _groups = self._base["group"]
+        _adapter = self._check_adapter(bot)
+        if _adapter is not None:
+            _groups = self.groups(_adapter)
             if f"{group_id}" in _groups:
-                for i in _groups[f"{group_id}"]:
-                    data[i] = _groups[f"{group_id}"][i]
+                for k, v in _groups[f"{group_id}"].items():
+                    data[k] = list(v) if isinstance(v, tuple) else v
         return data
 
+    def compact(self: RAM_Control) -> tuple[int, int]:
+        """
+        Shrink the resident document, see `ram_compact`.
+
+        Every group id and service name is interned, so each distinct string is
+        kept once, and the `enabled` and `disabled` lists become tuples. That is
+        safe because `_apply` always assigns fresh lists instead of mutating them.
+        Returns the deep size of the document before and after, in bytes.
+        """
+        _before, _after = super().compact(freeze=True)
+        log(
+            "INFO",
+            f"Compacted {self._filepath.name}: {_before} => {_after} bytes "
+            f"({(_before - _after) / (_before or 1):.0%} saved)",
+        )
+        return _before, _after
+
+    def memory_by_group(self: RAM_Control, adapter: str) -> dict[str, int]:
+        """
+        Return the deep size in bytes of every resident group of `adapter`, key included.
+
+        Groups that are still lazily encoded or live in a storage backend are not
+        resident in the document and are left out. Strings shared between groups,
+        such as interned service names, are counted for every group using them.
+        """
+        _groups = self.groups(adapter)
+        if isinstance(_groups, LazyMapping):
+            _items = _groups.resident()
+        elif isinstance(_groups, dict):
+            _items = _groups.items()
+        else:
+            return {}
+        return {k: deep_sizeof(k) + deep_sizeof(v) for k, v in _items}
+
 
 _amc = RAM_Control()
+metrics = Metrics()
+"""
+###   RAM - 运行指标
+-     开启 `ram_metrics` 时，记录每次 Rule 判定的结果与耗时
+-     通过 `ram -t` 或 `ram_metrics_path` 查看
+"""
+
+
+async def _export_metrics(request: Request) -> Response:
+    return Response(
+        200,
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        content=metrics.render(),
+    )
+
+
+if _opt.metrics:
+    _driver = get_driver()
+    if isinstance(_driver, ASGIMixin):
+        _driver.setup_http_server(
+            HTTPServerSetup(
+                URL(_opt.metrics_path), "GET", "ram_metrics", _export_metrics
+            )
+        )
+    else:
+        log("WARNING", f"Driver {_driver.type} serves no HTTP, use `ram {_opt.stats}`")
+if _opt.multiprocess:
+    FileStation.scheduler.add_job(
+        _amc.watch,
+        "interval",
+        seconds=_opt.watch_interval,
+        id="RAM_Control.watch",
+    )
 worker = on_command(_opt.cmd, permission=_opt.permission)
 
 
@@ -290,15 +1119,18 @@ async def _(
 ) -> None:
     actions = args.extract_plain_text().split(" ", 1)
     if len(actions) == 1:
-        if actions[0] == _opt.available:
+        if actions[0] in (_opt.available, _opt.stats):
             state["group_id"] = "0"
-            state["services"] = _opt.available
+            state["services"] = actions[0]
         elif actions[0] == _opt.show:
             state["services"] = _opt.show
     elif actions[0] == _opt.show:
         if actions[1].isdigit():
             state["group_id"] = actions[1]
         state["services"] = _opt.show
+    elif actions[0] in (_opt.query, _opt.level, _opt.move):
+        state["group_id"] = "0"
+        state["services"] = " ".join(actions)
 
 
 @worker.handle()
@@ -364,9 +1196,9 @@ async def _(
                 if int(_services[0]) > 99999999999999999999:
                     await worker.finish(f"Level too large: {_services[0]}")
                 segments = []
-                for group_id in state["group_ids"]:
-                    prev = _amc.check_universal(bot, group_id)
-                    _amc.set_universal(bot, group_id, level=int(_services[0]))
+                prevs = [_amc.check_universal(bot, i) for i in state["group_ids"]]
+                await _amc.submit(bot, state["group_ids"], level=int(_services[0]))
+                for group_id, prev in zip(state["group_ids"], prevs):
                     if len(state["group_ids"]) == 1:
                         segments.append(f"群 Level {prev} => " + str(state["services"]))
                     else:
@@ -405,15 +1237,22 @@ async def _(
                 await worker.finish("\n".join(queue))
             elif _services[0] == _opt.available:
                 await worker.finish("".join(["全局可用：", " ".join(available)]))
+            elif _services[0] == _opt.stats:
+                if not _opt.metrics:
+                    await worker.finish("未开启 ram_metrics")
+                await worker.finish(metrics.summary())
             else:
                 await worker.finish("Invalid input")
+        elif _services[0] in (_opt.query, _opt.level):
+            await worker.finish(_query_groups(bot, _services))
+        elif _services[0] == _opt.move:
+            await worker.finish(await _move_groups(bot, _services))
         elif _services[0] == _opt.add:
-            for group_id in state["group_ids"]:
-                _amc.set_universal(bot, group_id, _services)
+            await _amc.submit(bot, state["group_ids"], _services)
             _services.remove(_opt.add)
             invalid = []
             for i in _services:
-                if not i in available:
+                if not registry.is_available(i):
                     invalid.append(i)
             for i in invalid:
                 _services.remove(i)
@@ -424,12 +1263,11 @@ async def _(
                 message.append(f"未找到：{' '.join(invalid)}")
             await worker.finish("\n".join(message))
         elif _services[0] == _opt.rm:
-            for group_id in state["group_ids"]:
-                _amc.set_universal(bot, group_id, _services)
+            await _amc.submit(bot, state["group_ids"], _services)
             _services.remove(_opt.rm)
             invalid = []
             for i in _services:
-                if not i in available:
+                if not registry.is_available(i):
                     invalid.append(i)
             for i in invalid:
                 _services.remove(i)
@@ -441,6 +1279,9 @@ async def _(
             await worker.finish("\n".join(message))
         else:
             log("WARNING", f"Invalid input: {_services}")
+    except OSError as e:
+        log("ERROR", f"{e}")
+        await worker.finish(f"保存失败，修改未能写入磁盘：{e}")
     except ActionFailed as e:
         log(
             "WARNING",
@@ -448,9 +1289,150 @@ async def _(
         )
 
 
-available = []
+def _query_groups(bot: Bot, args: list[str]) -> str:
+    """
+    ###   RAM - 查询群聊
+    -     `-q sv1 [页码]` 查询启用了 sv1 的群聊
+    -     `-l 3 [页码]` 查询级别不低于 3 的群聊
+    """
+    _page = int(args[2]) if len(args) > 2 and args[2].isdigit() else 1
+    if len(args) < 2:
+        return "Invalid input"
+    if args[0] == _opt.query:
+        _title = f"启用 {args[1]} 的群聊"
+        _group_ids = _amc.find_groups(bot, args[1])
+    elif args[1].lstrip("-").isdigit():
+        _title = f"级别不低于 {args[1]} 的群聊"
+        _group_ids = _amc.find_groups(bot, min_level=int(args[1]))
+    else:
+        return "Invalid input"
+    _pages = max(1, -(-len(_group_ids) // _opt.page_size))
+    _page = max(1, min(_page, _pages))
+    _slice = _group_ids[(_page - 1) * _opt.page_size : _page * _opt.page_size]
+    return "\n".join(
+        [
+            f"{_title}（共 {len(_group_ids)} 个，第 {_page}/{_pages} 页）：",
+            " ".join(str(i) for i in _slice) or "无",
+        ]
+    )
+
+
+async def _move_groups(bot: Bot, args: list[str]) -> str:
+    """
+    ###   RAM - 整体调整级别
+    -     `-m 2 3` 将级别为 2 的群聊调整为级别 3
+    -     `-m 2-4 5` 将级别为 2 至 4 的群聊调整为级别 5
+    """
+    if len(args) != 3 or not args[2].isdigit():
+        return "Invalid input"
+    _from, _, _max = args[1].partition("-")
+    if not _from.isdigit() or _max and not _max.isdigit():
+        return "Invalid input"
+    if int(args[2]) > 99999999999999999999:
+        return f"Level too large: {args[2]}"
+    _count = await _amc.move_level(
+        bot, int(_from), int(args[2]), max_level=int(_max or _from)
+    )
+    return f"已将 {_count} 个群聊的 Level {args[1]} => {args[2]}"
+
+
 warning = False
 
+_onebot_v11 = OneBot_V11_Adapter.get_name()
+_group_id = attrgetter("group_id")
+_unsupported = object()
+_event_dispatch: dict[type, Optional[Callable[[Event], int]]] = {
+    OneBot_V11_PrivateMessageEvent: None,
+    OneBot_V11_GroupMessageEvent: _group_id,
+    OneBot_V11_GroupUploadNoticeEvent: _group_id,
+    OneBot_V11_GroupAdminNoticeEvent: _group_id,
+    OneBot_V11_GroupDecreaseNoticeEvent: _group_id,
+    OneBot_V11_GroupIncreaseNoticeEvent: _group_id,
+    OneBot_V11_GroupBanNoticeEvent: _group_id,
+    OneBot_V11_FriendAddNoticeEvent: None,
+    OneBot_V11_GroupRecallNoticeEvent: _group_id,
+    OneBot_V11_FriendRecallNoticeEvent: None,
+    OneBot_V11_PokeNotifyEvent: _group_id,
+    OneBot_V11_LuckyKingNotifyEvent: _group_id,
+    OneBot_V11_HonorNotifyEvent: _group_id,
+    OneBot_V11_FriendRequestEvent: None,
+    OneBot_V11_GroupRequestEvent: _group_id,
+    OneBot_V11_LifecycleMetaEvent: None,
+    OneBot_V11_HeartbeatMetaEvent: None,
+}
+"""
+###   RAM - 事件分派表
+-     事件类型到群号提取函数的映射，值为 None 时直接放行
+-     未登记的事件类型在首次出现时沿 MRO 解析，结果缓存在表中
+"""
+
+
+def _resolve_event(cls: type) -> Union[Callable[[Event], int], None, object]:
+    for base in cls.__mro__:
+        if base in _event_dispatch:
+            _event_dispatch[cls] = _event_dispatch[base]
+            break
+    else:
+        _event_dispatch[cls] = _unsupported
+    return _event_dispatch[cls]
+
+
+_decisions: dict[int, tuple[Event, int, Optional[GroupRecord]]] = {}
+"""
+###   RAM - 单次事件的查询缓存
+-     同一事件经过多个带有 `isInService` 的 Matcher 时，群聊记录只查询一次
+-     以事件的 id 为键，同时保存事件本身与数据版本，事件处理结束后移除
+"""
+
+
+def _lookup(
+    bot: Bot, event: Event, extract: Callable[[Event], int]
+) -> Optional[GroupRecord]:
+    _cached = _decisions.get(id(event))
+    if _cached and _cached[0] is event and _cached[1] == _amc.generation:
+        return _cached[2]
+    if len(_decisions) > 1024:
+        _decisions.clear()
+    _record = _amc.get_record(bot, extract(event))
+    _decisions[id(event)] = (event, _amc.generation, _record)
+    return _record
+
+
+@event_postprocessor
+async def _(event: Event) -> None:
+    _decisions.pop(id(event), None)
+
+
+def _predicate(
+    service: Optional[str], level: Optional[int]
+) -> Callable[[Optional[GroupRecord]], bool]:
+    """
+    ###   RAM - 判定函数
+    -     在创建 Rule 时按授权策略选定一次，事件到来时只做一次位运算或整数比较
+    """
+    if service and _opt.policy == 0:
+        _bit = registry.bit(service)
+
+        def _check(record: Optional[GroupRecord]) -> bool:
+            return bool(record and record.enabled & _bit)
+
+    elif level and _opt.policy == 1:
+        _unregistered = 0 >= level
+
+        def _check(record: Optional[GroupRecord]) -> bool:
+            return record.level >= level if record else _unregistered
+
+    else:
+
+        def _check(record: Optional[GroupRecord]) -> bool:
+            log(
+                "WARNING",
+                "Failed while checking the service or level. Please check the configuration.",
+            )
+            return True
+
+    return _check
+
 
 def isInService(service: Optional[str] = None, level: Optional[int] = None) -> Rule:
     """
@@ -465,86 +1447,63 @@ def isInService(service: Optional[str] = None, level: Optional[int] = None) -> R
     -     level: int  功能级别
     """
     global warning
-    if service and not service in available:
+    if service and not registry.is_available(service):
         if " " in service and not warning:
             log("WARNING", "At least 1 space found in the service name")
             warning = True
-        available.append(service)
-
-    async def _check(bot: Bot, group_id: int) -> bool:
-        if service and _opt.policy == 0:
-            return _amc.check_universal(bot, group_id, service)
-        elif level and _opt.policy == 1:
-            return _amc.check_universal(bot, group_id) >= level
-        else:
-            log(
-                "WARNING",
-                "Failed while checking the service or level. Please check the configuration.",
-            )
-            return True
+        registry.register(service)
+    _check = _predicate(service, level)
 
     async def _isInService(bot: Bot, event: Event) -> bool:
-        if bot.type == OneBot_V11_Adapter.get_name():
-            if isinstance(event, OneBot_V11_PrivateMessageEvent):
-                return True
-            elif isinstance(event, OneBot_V11_GroupMessageEvent):
-                group_id = event.group_id
-                return await _check(bot, group_id)
-            elif isinstance(event, OneBot_V11_GroupUploadNoticeEvent):
-                group_id = event.group_id
-                return await _check(bot, group_id)
-            elif isinstance(event, OneBot_V11_GroupAdminNoticeEvent):
-                group_id = event.group_id
-                return await _check(bot, group_id)
-            elif isinstance(event, OneBot_V11_GroupDecreaseNoticeEvent):
-                group_id = event.group_id
-                return await _check(bot, group_id)
-            elif isinstance(event, OneBot_V11_GroupIncreaseNoticeEvent):
-                group_id = event.group_id
-                return await _check(bot, group_id)
-            elif isinstance(event, OneBot_V11_GroupBanNoticeEvent):
-                group_id = event.group_id
-                return await _check(bot, group_id)
-            elif isinstance(event, OneBot_V11_FriendAddNoticeEvent):
-                return True
-            elif isinstance(event, OneBot_V11_GroupRecallNoticeEvent):
-                group_id = event.group_id
-                return await _check(bot, group_id)
-            elif isinstance(event, OneBot_V11_FriendRecallNoticeEvent):
-                return True
-            elif isinstance(event, OneBot_V11_PokeNotifyEvent):
-                group_id = event.group_id
-                return await _check(bot, group_id)
-            elif isinstance(event, OneBot_V11_LuckyKingNotifyEvent):
-                group_id = event.group_id
-                return await _check(bot, group_id)
-            elif isinstance(event, OneBot_V11_HonorNotifyEvent):
-                group_id = event.group_id
-                return await _check(bot, group_id)
-            elif isinstance(event, OneBot_V11_FriendRequestEvent):
-                return True
-            elif isinstance(event, OneBot_V11_GroupRequestEvent):
-                group_id = event.group_id
-                return await _check(bot, group_id)
-            elif isinstance(event, OneBot_V11_LifecycleMetaEvent):
+        if bot.type == _onebot_v11:
+            try:
+                _extract = _event_dispatch[event.__class__]
+            except KeyError:
+                _extract = _resolve_event(event.__class__)
+            if _extract is None:
                 return True
-            elif isinstance(event, OneBot_V11_HeartbeatMetaEvent):
-                return True
-
-            else:
+            elif _extract is _unsupported:
                 log("WARNING", f"Unsupported event: {event.get_event_name()}")
                 return True
+            return _check(_lookup(bot, event, _extract))
         else:
             log("WARNING", f"Unsupported adapter: {bot.type}")
             return True
 
-    return Rule(_isInService)
+    if not _opt.metrics:
+        return Rule(_isInService)
+    if service and _opt.policy == 0:
+        _rule = service
+    elif level and _opt.policy == 1:
+        _rule = f"level>={level}"
+    else:
+        _rule = None
+
+    async def _measured(bot: Bot, event: Event) -> bool:
+        _start = perf_counter()
+        _result = await _isInService(bot, event)
+        _seconds = perf_counter() - _start
+        if bot.type != _onebot_v11:
+            metrics.observe("unsupported_adapter", None, _seconds)
+            return _result
+        _extract = _event_dispatch[event.__class__]
+        if _extract is _unsupported:
+            metrics.observe("unsupported_event", None, _seconds)
+        else:
+            metrics.observe(
+                "allowed" if _result else "denied",
+                None if _extract is None else _rule,
+                _seconds,
+            )
+        return _result
+
+    return Rule(_measured)
 
 
 __plugin_meta__ = PluginMetadata(
     name="RAM - 基于规则的授权管理",
     description="为 Matcher 配置一条或多条 Rule 来实现功能的授权管理",
-    usage=f"{config.ram_cmd} [{config.ram_add} <service>] [{config.ram_rm} <service>] [{config.ram_show}] [{config.ram_available}] [\d+]",
+    usage=f"{config.ram_cmd} [{config.ram_add} <service>] [{config.ram_rm} <service>] [{config.ram_show}] [{config.ram_available}] [{config.ram_query} <service> [page]] [{config.ram_level} <level> [page]] [{config.ram_move} <level>[-<level>] <level>] [{config.ram_stats}] [\d+]",
     homepage="https://github.com/Lancercmd/nonebot_plugin_rauthman",
     type="application",
     supported_adapters={"~onebot.v11"},
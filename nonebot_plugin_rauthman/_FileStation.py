@@ -1,21 +1,1052 @@
 from __future__ import annotations
 
-from datetime import datetime
-from os import makedirs, remove, rename
+from abc import ABC, abstractmethod
+from asyncio import gather, get_running_loop
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta
+from functools import partial
+from hashlib import blake2b
+from itertools import count
+from mmap import ACCESS_READ, mmap
+from os import O_CREAT, O_RDONLY, O_RDWR, close, fstat, fsync, ftruncate, lseek
+from os import makedirs
+from os import read as readFd
+from os import remove, rename, replace
+from os import write as writeFd
+from os import name as osName
+from os import open as openFd
 from pathlib import Path
 from re import sub
-from sys import getsizeof
+from struct import Struct
+from struct import error as struct_error
+from sys import getsizeof, intern
 from tempfile import mkdtemp
-from typing import Any, Iterator
+from threading import Lock, RLock
+from time import monotonic
+from typing import Any, Callable, Iterator
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.schedulers.base import BaseScheduler
 from loguru import logger
-from ujson import dump as dumpJson
 from ujson import dumps as dumpJsonS
 from ujson import load as loadJson
 from ujson import loads as loadJsonS
 
+try:
+    from fcntl import LOCK_EX, LOCK_NB, LOCK_UN, flock
+except ImportError:
+    from msvcrt import LK_LOCK, LK_NBLCK, LK_UNLCK, locking
+
+    flock = None
+
+
+class Serializer(ABC):
+    """
+    ##    Serializer - FileStation 的文件格式
+    -     FileStation 将 self._data 的每个一级字段与二级字段分别编码为片段，未被修改的片段在下次写入时直接复用。
+    -     因此格式需要支持将已编码的片段拼接为字典，见 prefix(), separator 与 frame()。
+    -     header 为文件开头的标识，用于加载时自动识别格式，为空表示没有标识。
+    """
+
+    name: str = ""
+    """格式名称"""
+    suffix: str = ""
+    """格式对应的扩展名，没有标识的文件按扩展名识别"""
+    header: bytes = b""
+    """文件开头的标识"""
+    separator: bytes = b""
+    """字典中相邻两项之间的分隔符"""
+
+    @abstractmethod
+    def fragment(self, value: Any, depth: int) -> bytes:
+        """
+        ###   Serializer - 编码片段
+
+        ###   参数
+        -     value: Any  片段的值
+        -     depth: int  片段所在的层级，一级字段的值为 1
+        """
+
+    @abstractmethod
+    def prefix(self, key: str, depth: int) -> bytes:
+        """
+        ###   Serializer - 编码键
+        -     返回字典中一项在值之前的部分，depth 为字典所在的层级。
+        """
+
+    @abstractmethod
+    def frame(self, count: int, size: int, depth: int) -> tuple[bytes, bytes]:
+        """
+        ###   Serializer - 字典的首尾
+        -     返回包含 count 项、各项与分隔符共 size 字节的字典的开头与结尾。
+        """
+
+    def join(self, fragments: list[tuple[str, bytes]], depth: int) -> bytes:
+        """
+        ###   Serializer - 拼接片段
+        -     将已编码的 (键, 片段) 拼接为字典，结果与直接编码整个字典一致。
+        """
+        _body = self.separator.join([self.prefix(k, depth) + v for k, v in fragments])
+        _open, _close = self.frame(len(fragments), len(_body), depth)
+        return _open + _body + _close
+
+    def dumps(self, data: Any) -> bytes:
+        """
+        ###   Serializer - 编码完整文件
+        """
+        return self.header + self.fragment(data, 0)
+
+    @abstractmethod
+    def loads(self, raw: bytes) -> Any:
+        """
+        ###   Serializer - 解码完整文件
+        """
+
+
+class PrettyJson(Serializer):
+    """
+    ##    PrettyJson - 缩进为 4 的 JSON
+    -     便于阅读与手动修改，默认格式。
+    """
+
+    name = "pretty"
+    suffix = ".json"
+    separator = b",\n"
+
+    def fragment(self, value: Any, depth: int) -> bytes:
+        return (
+            dumpJsonS(value, ensure_ascii=False, indent=4)
+            .replace("\n", "\n" + "    " * depth)
+            .encode("utf-8")
+        )
+
+    def prefix(self, key: str, depth: int) -> bytes:
+        _key = dumpJsonS(key, ensure_ascii=False)
+        return f"{'    ' * (depth + 1)}{_key}: ".encode("utf-8")
+
+    def frame(self, count: int, size: int, depth: int) -> tuple[bytes, bytes]:
+        if not count:
+            return b"{", b"}"
+        return b"{\n", b"\n" + ("    " * depth).encode() + b"}"
+
+    def loads(self, raw: bytes) -> Any:
+        return loadJsonS(raw)
+
+
+class CompactJson(PrettyJson):
+    """
+    ##    CompactJson - 不含空白的 JSON
+    -     与 PrettyJson 读取方式相同，文件体积更小，解析更快。
+    """
+
+    name = "compact"
+    separator = b","
+
+    def fragment(self, value: Any, depth: int) -> bytes:
+        return dumpJsonS(value, ensure_ascii=False).encode("utf-8")
+
+    def prefix(self, key: str, depth: int) -> bytes:
+        return dumpJsonS(key, ensure_ascii=False).encode("utf-8") + b":"
+
+    def frame(self, count: int, size: int, depth: int) -> tuple[bytes, bytes]:
+        return b"{", b"}"
+
+
+class Binary(Serializer):
+    """
+    ##    Binary - 长度前缀的二进制格式
+    -     每个值以一个字节的类型标记开头，字符串带有字节长度前缀，列表与字典带有元素数量与字节长度前缀。
+    -     解码时无需扫描分隔符与转义，也可以直接跳过不需要的值，见 LazyMapping。
+    -     文件以 `RAMB` 与版本号开头。
+    -     超出 64 位的整数等其他值以 JSON 文本保存。
+    """
+
+    name = "binary"
+    suffix = ".ramb"
+    header = b"RAMB\x00\x01"
+    lazy_threshold: int = 4096
+    """延迟解码时，字节长度不小于该值的字典解码为 LazyMapping，较小的字典直接解码"""
+    _size = Struct(">I")
+    _sized = Struct(">II")
+    _int = Struct(">q")
+    _float = Struct(">d")
+
+    def _str(self, value: str) -> bytes:
+        _raw = value.encode("utf-8")
+        return self._size.pack(len(_raw)) + _raw
+
+    def fragment(self, value: Any, depth: int = 0) -> bytes:
+        if value is None:
+            return b"N"
+        elif value is True:
+            return b"T"
+        elif value is False:
+            return b"F"
+        elif isinstance(value, int) and -(2**63) <= value < 2**63:
+            return b"I" + self._int.pack(value)
+        elif isinstance(value, float):
+            return b"D" + self._float.pack(value)
+        elif isinstance(value, str):
+            return b"S" + self._str(value)
+        elif isinstance(value, (list, tuple)):
+            _body = b"".join(self.fragment(i) for i in value)
+            return b"L" + self._sized.pack(len(value), len(_body)) + _body
+        elif isinstance(value, LazyMapping):
+            return self.join(
+                [(k, raw or self.fragment(value[k])) for k, raw in value.encoded()],
+                depth,
+            )
+        elif isinstance(value, dict) and all(isinstance(k, str) for k in value):
+            return self.join([(k, self.fragment(v)) for k, v in value.items()], depth)
+        return b"J" + self._str(dumpJsonS(value, ensure_ascii=False))
+
+    def prefix(self, key: str, depth: int) -> bytes:
+        return self._str(key)
+
+    def frame(self, count: int, size: int, depth: int) -> tuple[bytes, bytes]:
+        return b"M" + self._sized.pack(count, size), b""
+
+    def loads(self, raw: bytes, *, lazy: bool = False) -> Any:
+        """
+        ###   Binary - 解码完整文件
+
+        ###   参数
+        -     raw: bytes  文件内容，也可以是 mmap 等支持缓冲区协议的对象
+        -     lazy: bool  是否延迟解码，为 True 时顶层字典的较大的值解码为 LazyMapping，默认为 False
+        """
+        _view = memoryview(raw)
+        _offset = len(self.header) if raw[: len(self.header)] == self.header else 0
+        try:
+            if lazy:
+                _top = self._decode_lazy(_view, _offset)
+                offset = self._skip(_view, _offset)
+                value = dict(_top) if isinstance(_top, LazyMapping) else _top
+            else:
+                value, offset = self._decode(_view, _offset)
+        except struct_error as e:
+            raise ValueError(e) from e
+        if offset != len(_view):
+            raise ValueError(f"Trailing data at offset {offset}")
+        return value
+
+    def _decode(self, view: memoryview, offset: int) -> tuple[Any, int]:
+        _tag = view[offset : offset + 1].tobytes()
+        offset += 1
+        if _tag == b"N":
+            return None, offset
+        elif _tag == b"T":
+            return True, offset
+        elif _tag == b"F":
+            return False, offset
+        elif _tag == b"I":
+            return self._int.unpack_from(view, offset)[0], offset + 8
+        elif _tag == b"D":
+            return self._float.unpack_from(view, offset)[0], offset + 8
+        elif _tag in (b"S", b"J"):
+            _value, offset = self._decode_str(view, offset)
+            return (_value if _tag == b"S" else loadJsonS(_value)), offset
+        elif _tag == b"L":
+            _count, _ = self._sized.unpack_from(view, offset)
+            offset += 8
+            _list = []
+            for _ in range(_count):
+                _value, offset = self._decode(view, offset)
+                _list.append(_value)
+            return _list, offset
+        elif _tag == b"M":
+            _count, _ = self._sized.unpack_from(view, offset)
+            offset += 8
+            _dict = {}
+            for _ in range(_count):
+                _key, offset = self._decode_str(view, offset)
+                _dict[_key], offset = self._decode(view, offset)
+            return _dict, offset
+        raise ValueError(f"Unknown tag {_tag!r} at offset {offset - 1}")
+
+    def _decode_str(self, view: memoryview, offset: int) -> tuple[str, int]:
+        (_length,) = self._size.unpack_from(view, offset)
+        offset += 4
+        if offset + _length > len(view):
+            raise ValueError(f"Truncated string at offset {offset}")
+        return str(view[offset : offset + _length], "utf-8"), offset + _length
+
+    def _skip(self, view: memoryview, offset: int) -> int:
+        """
+        ###   Binary - 跳过一个值
+        -     不解码，只根据长度前缀返回下一个值的位置。
+        """
+        _tag = view[offset : offset + 1].tobytes()
+        offset += 1
+        if _tag in (b"N", b"T", b"F"):
+            return offset
+        elif _tag in (b"I", b"D"):
+            return offset + 8
+        elif _tag in (b"S", b"J"):
+            return offset + 4 + self._size.unpack_from(view, offset)[0]
+        elif _tag in (b"L", b"M"):
+            _end = offset + 8 + self._sized.unpack_from(view, offset)[1]
+            if _end > len(view):
+                raise ValueError(f"Truncated container at offset {offset - 1}")
+            return _end
+        raise ValueError(f"Unknown tag {_tag!r} at offset {offset - 1}")
+
+    def _decode_lazy(self, view: memoryview, offset: int) -> Any:
+        """
+        ###   Binary - 延迟解码一个值
+        -     字节长度不小于 lazy_threshold 的字典只建立键到位置的索引，返回 LazyMapping，其余值直接解码。
+        """
+        if view[offset : offset + 1] != b"M":
+            return self._decode(view, offset)[0]
+        _count, _size = self._sized.unpack_from(view, offset + 1)
+        if _size < self.lazy_threshold:
+            return self._decode(view, offset)[0]
+        offset += 9
+        _items = {}
+        for _ in range(_count):
+            _key, offset = self._decode_str(view, offset)
+            _end = self._skip(view, offset)
+            _items[_key] = LazyMapping.Raw(offset, _end)
+            offset = _end
+        return LazyMapping(view, _items, self)
+
+
+class LazyMapping(MutableMapping):
+    """
+    ##    LazyMapping - 延迟解码的字典
+    -     由 Binary 在延迟解码时创建，只保存键与对应的值在文件中的位置，值在第一次被访问时才解码，然后保存解码结果。
+    -     被访问过的值与普通字典中的值一样可以原地修改，未被访问过的值在写入时直接复用原始字节。
+    -     ujson 序列化时通过 toDict() 取得完整的字典。
+    """
+
+    class Raw:
+        __slots__ = ("start", "end")
+
+        def __init__(self, start: int, end: int) -> None:
+            self.start = start
+            self.end = end
+
+    __slots__ = ("_view", "_items", "_serializer")
+
+    def __init__(self, view: memoryview, items: dict, serializer: Binary) -> None:
+        self._view = view
+        self._items = items
+        self._serializer = serializer
+
+    def __getitem__(self, key: str) -> Any:
+        _value = self._items[key]
+        if isinstance(_value, LazyMapping.Raw):
+            _value = self._serializer._decode_lazy(self._view, _value.start)
+            self._items[key] = _value
+        return _value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._items[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        del self._items[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._items
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __repr__(self) -> str:
+        return f"LazyMapping({self.decoded()}/{len(self._items)} decoded)"
+
+    def decoded(self) -> int:
+        """
+        ###   LazyMapping - 已解码的值的数量
+        """
+        return sum(
+            1 for i in self._items.values() if not isinstance(i, LazyMapping.Raw)
+        )
+
+    def encoded(self) -> Iterator[tuple[str, Optional[bytes]]]:
+        """
+        ###   LazyMapping - 遍历原始字节
+        -     未被访问过的值返回其原始字节，其余值返回 None。
+        """
+        for k, v in self._items.items():
+            if isinstance(v, LazyMapping.Raw):
+                yield k, self._view[v.start : v.end].tobytes()
+            else:
+                yield k, None
+
+    def resident(self) -> Iterator[tuple[str, Any]]:
+        """
+        ###   LazyMapping - 遍历已解码的值
+        -     只返回已经解码、驻留在内存中的键值对，不会解码任何值。
+        """
+        for k, v in self._items.items():
+            if not isinstance(v, LazyMapping.Raw):
+                yield k, v
+
+    def copy(self) -> LazyMapping:
+        """
+        ###   LazyMapping - 复制
+        -     复制索引，未解码的值共用原始字节，已解码的值见 `deep_copy`。
+        """
+        return LazyMapping(
+            self._view,
+            {
+                k: v if isinstance(v, LazyMapping.Raw) else deep_copy(v)
+                for k, v in self._items.items()
+            },
+            self._serializer,
+        )
+
+    def reorder(self, keys: list[str]) -> None:
+        """
+        ###   LazyMapping - 重新排序
+        -     按照 keys 的顺序重新排列，不会解码任何值。
+        """
+        self._items = {k: self._items[k] for k in keys}
+
+    def toDict(self) -> dict:
+        return {k: self[k] for k in self._items}
+
+
+class CowMapping(MutableMapping):
+    """
+    ##    CowMapping - 写时复制的字典视图
+    -     读取时与原字典共享数据，写入时只记录在视图自身，原字典不会被修改。
+    -     字典类型的值在第一次读取时包装为新的 CowMapping，因此嵌套的字典同样只在被写入的部分产生拷贝。
+    -     列表类型的值在第一次读取时复制，其余类型的值不可变，直接返回。
+    -     未被写入的部分始终反映原字典当前的内容。
+    -     ujson 序列化时通过 toDict() 取得完整的字典。
+    """
+
+    __slots__ = ("_base", "_own", "_deleted")
+
+    def __init__(self, base: MutableMapping) -> None:
+        self._base = base
+        self._own: dict = {}
+        self._deleted: set = set()
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._own:
+            return self._own[key]
+        elif key in self._deleted:
+            raise KeyError(key)
+        _value = self._base[key]
+        if isinstance(_value, (dict, LazyMapping, CowMapping)):
+            _value = self._own[key] = CowMapping(_value)
+        elif isinstance(_value, list):
+            _value = self._own[key] = loadJsonS(dumpJsonS(_value))
+        return _value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._own[key] = value
+        self._deleted.discard(key)
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        self._own.pop(key, None)
+        if key in self._base:
+            self._deleted.add(key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._own or (key not in self._deleted and key in self._base)
+
+    def __iter__(self) -> Iterator[str]:
+        for k in self._base:
+            if k not in self._deleted:
+                yield k
+        for k in self._own:
+            if k not in self._base:
+                yield k
+
+    def __len__(self) -> int:
+        return (
+            len(self._base)
+            - len(self._deleted)
+            + sum(1 for k in self._own if k not in self._base)
+        )
+
+    def __repr__(self) -> str:
+        return repr(self.toDict())
+
+    def toDict(self) -> dict:
+        return {k: self[k] for k in self}
+
+
+class Fragment:
+    """
+    ##    Fragment - 序列化片段
+    -     字典中的一项，创建时只保存键与值的引用，第一次读取时才按照文件格式编码，见 Serializer.prefix()。
+    -     编码结果与摘要会被保存下来，可以被多个快照共用，因此编码可以推迟到事件循环之外的线程中进行。
+    -     值被保存的是引用，所以被标记为已修改的值不能再原地修改，只能替换为新的对象后再次标记。
+    -     键为 None 时为整个文件的内容，没有键的部分。
+    """
+
+    __slots__ = ("key", "value", "depth", "encoded", "_raw", "_digest")
+
+    def __init__(
+        self,
+        key: Optional[str],
+        value: Any,
+        depth: int,
+        encoded: Optional[bytes] = None,
+    ) -> None:
+        self.key = key
+        self.value = value
+        self.depth = depth
+        self.encoded = encoded
+        self._raw = None
+        self._digest = None
+
+    def raw(self, serializer: Serializer) -> bytes:
+        """
+        ###   Fragment - 编码
+        -     返回包括键在内的编码结果，encoded 不为 None 时为已经编码的值，例如 LazyMapping 中未解码的原始字节。
+        """
+        if self._raw is None:
+            _raw = self.encoded
+            if _raw is None:
+                _raw = serializer.fragment(self.value, self.depth)
+            if self.key is not None:
+                _raw = serializer.prefix(self.key, self.depth - 1) + _raw
+            self._raw = _raw
+        return self._raw
+
+    def digest(self, serializer: Serializer) -> bytes:
+        if self._digest is None:
+            self._digest = blake2b(self.raw(serializer), digest_size=16).digest()
+        return self._digest
+
+
+class FragmentNode:
+    """
+    ##    FragmentNode - 片段树的节点
+    -     对应 self._data 中一个键均为字符串的字典，子节点为 Fragment 或 FragmentNode，顺序与字典一致，根节点的键为 None。
+    -     节点创建后不再修改，数据被修改时只复制从根节点到被修改的值的路径，其余子树在新旧快照之间共用。
+    -     摘要由键与子节点的摘要组合而成，拼接时直接复用子节点的字节，未被修改的部分不需要重新编码。
+    """
+
+    __slots__ = ("key", "children", "depth", "_digest")
+
+    def __init__(self, key: Optional[str], children: dict, depth: int) -> None:
+        self.key = key
+        self.children = children
+        self.depth = depth
+        self._digest = None
+
+    def digest(self, serializer: Serializer) -> bytes:
+        if self._digest is None:
+            _digest = blake2b(dumpJsonS(self.key).encode(), digest_size=16)
+            _digest.update(
+                b"".join([i.digest(serializer) for i in self.children.values()])
+            )
+            self._digest = _digest.digest()
+        return self._digest
+
+    def render(self, serializer: Serializer, chunks: list[bytes]) -> int:
+        """
+        ###   FragmentNode - 拼接
+        -     将节点编码后的各部分依次追加到 chunks 中，返回追加的字节数，最后只需要拼接一次。
+        """
+        _head = len(chunks)
+        chunks.append(b"")
+        _size = 0
+        for i, child in enumerate(self.children.values()):
+            if i:
+                chunks.append(serializer.separator)
+                _size += len(serializer.separator)
+            if isinstance(child, FragmentNode):
+                _size += child.render(serializer, chunks)
+            else:
+                chunks.append(child.raw(serializer))
+                _size += len(chunks[-1])
+        _open, _close = serializer.frame(len(self.children), _size, self.depth)
+        if self.key is not None:
+            _open = serializer.prefix(self.key, self.depth - 1) + _open
+        chunks[_head] = _open
+        chunks.append(_close)
+        return len(_open) + _size + len(_close)
+
+
+serializers: dict[str, Serializer] = {
+    i.name: i for i in (PrettyJson(), CompactJson(), Binary())
+}
+"""所有可用的格式，按名称索引"""
+
+
+def get_serializer(name: str | Serializer) -> Serializer:
+    """
+    ###   说明
+    -     按名称获取格式，未知的名称输出警告并使用 `pretty`
+
+    ###   参数
+    -     name: str | Serializer  格式名称，可选值为 `pretty`, `compact`, `binary`
+    """
+    if isinstance(name, Serializer):
+        return name
+    elif name in serializers:
+        return serializers[name]
+    logger.warning(f"Unknown serializer {name}, fallback to pretty")
+    return serializers["pretty"]
+
+
+def detect(raw: bytes, filepath: Optional[str | Path] = None) -> Serializer:
+    """
+    ###   说明
+    -     按文件开头的标识识别格式，没有标识时按扩展名识别，都无法识别时视为 JSON
+
+    ###   参数
+    -     raw: bytes  文件内容
+    -     filepath: str | Path  文件路径，默认为 None
+    """
+    for i in serializers.values():
+        if i.header and raw.startswith(i.header):
+            return i
+    if filepath:
+        _suffix = Path(filepath).suffix
+        for i in serializers.values():
+            if i.header and i.suffix == _suffix:
+                return i
+    return serializers["pretty"]
+
+
+def load_bytes(raw: bytes, filepath: Optional[str | Path] = None) -> Any:
+    """
+    ###   说明
+    -     自动识别格式并解码文件内容，内容无法解码时抛出 ValueError
+    """
+    return detect(raw, filepath).loads(raw)
+
+
+_write_locks: dict[Path, RLock] = {}
+"""以文件路径为键，atomic_write() 使用的线程锁，见 write_lock()"""
+
+
+def write_lock(filepath: str | Path) -> RLock:
+    """
+    ###   说明
+    -     返回本进程内写入 filepath 的锁，atomic_write() 在锁内使用 `<filepath>_safe` 副本，多个线程同时写入同一个文件时依次进行。
+    -     锁可以重入，调用者可以持有锁完成写入前的检查，再调用 atomic_write()。
+    """
+    return _write_locks.setdefault(Path(filepath).resolve(), RLock())
+
+
+def sync_file(filepath: str | Path) -> None:
+    """
+    ###   说明
+    -     fsync 已经存在的文件及其所在目录，使之前不带 fsync 的写入在断电后仍然有效。
+    """
+    _fd = openFd(filepath, O_RDONLY)
+    try:
+        fsync(_fd)
+    finally:
+        close(_fd)
+    if osName != "nt":
+        _fd = openFd(Path(filepath).parent, O_RDONLY)
+        try:
+            fsync(_fd)
+        finally:
+            close(_fd)
+
+
+def atomic_write(filepath: str | Path, data: bytes, *, durable: bool = True) -> None:
+    """
+    ###   说明
+    -     原子地写入文件：先写入同目录下的 `<filepath>_safe`，再用 `os.replace` 替换原文件。
+    -     任何时刻读取原文件，要么是旧内容，要么是新内容，不会读到缺失或只写了一半的文件。
+    -     写入在 write_lock() 内进行，同一进程中的多个线程不会同时使用同一个副本。
+    -     durable 为 True 时，替换前 fsync 副本，替换后 fsync 所在目录，保证断电后替换仍然有效。
+    -     Windows 无法打开目录，因此跳过目录的 fsync。
+
+    ###   参数
+    -     filepath: str | Path  文件路径
+    -     data: bytes  文件内容
+    -     durable: bool  是否 fsync，默认为 True
+    """
+    _safe = f"{filepath}_safe"
+    with write_lock(filepath):
+        with open(_safe, "wb") as f:
+            f.write(data)
+            if durable:
+                f.flush()
+                fsync(f.fileno())
+        replace(_safe, filepath)
+    if durable and osName != "nt":
+        _fd = openFd(Path(filepath).parent, O_RDONLY)
+        try:
+            fsync(_fd)
+        finally:
+            close(_fd)
+
+
+def recover_safe(filepath: str | Path) -> None:
+    """
+    ###   说明
+    -     处理上次写入中断时遗留的 `<filepath>_safe` 副本。
+    -     原文件存在时，副本是未完成的写入，原文件仍然完整，直接删除副本。
+    -     原文件不存在时，副本是唯一的数据，能够完整解析就替换为原文件，否则重命名为 `<filepath>_corrupt` 保留。
+
+    ###   参数
+    -     filepath: str | Path  文件路径
+    """
+    _safe = Path(f"{filepath}_safe")
+    if not _safe.exists():
+        return
+    if Path(filepath).exists():
+        logger.warning(f"Removed unfinished {_safe}")
+        remove(_safe)
+        return
+    try:
+        with open(_safe, "rb") as f:
+            load_bytes(f.read(), filepath)
+    except ValueError:
+        logger.error(f"Unable to recover {filepath}, moved {_safe} aside")
+        replace(_safe, f"{filepath}_corrupt")
+        return
+    replace(_safe, filepath)
+    logger.warning(f"Recovered {filepath} from {_safe}")
+
+
+def deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """
+    ###   说明
+    -     递归计算对象及其引用的所有键、值与元素的内存占用，单位为字节。
+    -     按对象的 id 去重，同一个对象（如驻留的字符串）只计算一次。
+    -     LazyMapping 只计算已解码的值与占位对象，映射的文件内容不计入。
+
+    ###   参数
+    -     obj: Any  要计算的对象
+    -     seen: set  已经计算过的对象的 id，在多次调用间共享时不重复计算，默认为 None
+    """
+    seen = set() if seen is None else seen
+    _size = 0
+    _stack = [obj]
+    while _stack:
+        _obj = _stack.pop()
+        if id(_obj) in seen:
+            continue
+        seen.add(id(_obj))
+        _size += getsizeof(_obj)
+        if isinstance(_obj, dict):
+            _stack.extend(_obj.keys())
+            _stack.extend(_obj.values())
+        elif isinstance(_obj, (list, tuple, set, frozenset)):
+            _stack.extend(_obj)
+        elif isinstance(_obj, LazyMapping):
+            _stack.append(_obj._items)
+        elif isinstance(_obj, CowMapping):
+            _stack.extend((_obj._base, _obj._own, _obj._deleted))
+    return _size
+
+
+def deep_copy(value: Any) -> Any:
+    """
+    ###   说明
+    -     逐层复制字典与列表，之后对 value 的原地修改不会影响复制的结果。
+    -     LazyMapping 只复制索引，CowMapping 转换为字典，其他值视为不可变，直接共用。
+    """
+    if isinstance(value, dict):
+        return {k: deep_copy(v) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [deep_copy(i) for i in value]
+    elif isinstance(value, tuple):
+        return tuple(deep_copy(i) for i in value)
+    elif isinstance(value, LazyMapping):
+        return value.copy()
+    elif isinstance(value, CowMapping):
+        return deep_copy(value.toDict())
+    return value
+
+
+def compact(value: Any, *, freeze: bool = False) -> Any:
+    """
+    ###   说明
+    -     驻留所有的字符串键与字符串值，相同内容的字符串只保留一份。
+    -     字典原地压缩，保持原有的对象与顺序不变，其他值返回压缩后的对象。
+    -     LazyMapping 与 CowMapping 保持不变，避免触发解码或复制。
+
+    ###   参数
+    -     value: Any  要压缩的对象
+    -     freeze: bool  是否将列表转换为元组，省去列表预留的空间，默认为 False
+    """
+    if isinstance(value, str):
+        return intern(value)
+    elif isinstance(value, dict):
+        _items = [
+            (intern(k) if isinstance(k, str) else k, compact(v, freeze=freeze))
+            for k, v in value.items()
+        ]
+        value.clear()
+        value.update(_items)
+        return value
+    elif isinstance(value, list):
+        _items = [compact(i, freeze=freeze) for i in value]
+        if freeze:
+            return tuple(_items)
+        value[:] = _items
+        return value
+    elif isinstance(value, tuple):
+        return tuple(compact(i, freeze=freeze) for i in value)
+    return value
+
+
+class FlushPolicy:
+    """
+    ##    FlushPolicy - 文件写入策略
+    -     决定等待队列中的文件何时应当写入磁盘，满足以下任意一个条件即可：
+        -     age  文件自首次修改起已经等待了 max_age 秒，限制了数据落盘的最大延迟
+        -     pending  文件积累了 max_pending 次修改，限制了未落盘的修改数量
+        -     idle  文件在最后一次修改后保持空闲 idle 秒，连续的修改因此被合并为一次写入
+    """
+
+    def __init__(
+        self, max_age: float = 300.0, max_pending: int = 100, idle: float = 10.0
+    ) -> None:
+        """
+        ###   FlushPolicy - 构造函数
+
+        ###   参数
+        -     max_age: float  最大等待秒数，默认为 300
+        -     max_pending: int  最大修改次数，默认为 100
+        -     idle: float  空闲秒数，默认为 10
+        """
+        self.max_age = max_age
+        self.max_pending = max_pending
+        self.idle = idle
+        self.triggers: dict[str, int] = {"age": 0, "pending": 0, "idle": 0}
+
+    def reason(self, entry: FlushQueue.Entry, now: float) -> Optional[str]:
+        """
+        ###   FlushPolicy - 判断文件是否应当写入
+        -     返回满足的条件名称，均不满足时返回 None。
+        """
+        if entry.pending >= self.max_pending:
+            return "pending"
+        elif now - entry.enqueued >= self.max_age:
+            return "age"
+        elif now - entry.changed >= self.idle:
+            return "idle"
+        return None
+
+    def deadline(self, entry: FlushQueue.Entry) -> float:
+        """
+        ###   FlushPolicy - 获取文件最晚的写入时间
+        -     以 `time.monotonic()` 为基准，处于重试退避期间的文件不早于重试时间。
+        """
+        if entry.pending >= self.max_pending:
+            _deadline = entry.changed
+        else:
+            _deadline = min(entry.enqueued + self.max_age, entry.changed + self.idle)
+        return max(_deadline, entry.retry_at)
+
+
+class FlushQueue:
+    """
+    ##    FlushQueue - 有序去重的文件写入队列
+    -     同一个文件在写入前被多次加入队列时只保留一项，并保留最早加入的时间，用于计算积压时长。
+    -     标记为关键的文件优先写入，其余文件按加入顺序写入，每次最多同时写入 concurrency 个文件。
+    -     写入失败的文件按指数退避重试，在退避期间不会被再次写入，强制写入时除外。
+    """
+
+    class Entry:
+        __slots__ = ("enqueued", "changed", "pending", "attempts", "retry_at")
+
+        def __init__(self, enqueued: float) -> None:
+            self.enqueued = enqueued
+            self.changed = enqueued
+            self.pending = 1
+            self.attempts = 0
+            self.retry_at = 0.0
+
+    def __init__(
+        self, concurrency: int = 2, backoff: float = 5.0, max_backoff: float = 600.0
+    ) -> None:
+        """
+        ###   FlushQueue - 构造函数
+
+        ###   参数
+        -     concurrency: int  同时写入的文件数量上限，默认为 2
+        -     backoff: float  首次重试前等待的秒数，之后每次失败翻倍，默认为 5
+        -     max_backoff: float  重试等待的秒数上限，默认为 600
+        """
+        self.concurrency = concurrency
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.critical: set = set()
+        self.policy = FlushPolicy()
+        self.listener: Optional[Callable[[], None]] = None
+        self.mutations = 0
+        self.writes = 0
+        self.flushes = 0
+        self.flush_seconds = 0.0
+        self.flushed_bytes = 0
+        self._entries: dict[Path, FlushQueue.Entry] = {}
+
+    def add(self, path: Path, *, critical: bool = False) -> None:
+        """
+        ###   FlushQueue - 加入队列
+        -     文件已在队列中时保持原有位置与加入时间，并记录一次新的修改。
+        -     之后通知 listener，以便按照写入策略重新安排写入时间。
+
+        ###   参数
+        -     path: Path  文件路径
+        -     critical: bool  是否将该文件标记为关键文件，默认为 False
+        """
+        if critical:
+            self.critical.add(path)
+        self.mutations += 1
+        _now = monotonic()
+        if path in self._entries:
+            self._entries[path].pending += 1
+            self._entries[path].changed = _now
+        else:
+            self._entries[path] = FlushQueue.Entry(_now)
+        if self.listener:
+            self.listener()
+
+    def discard(self, path: Path) -> None:
+        self._entries.pop(path, None)
+
+    def remove(self, path: Path) -> None:
+        del self._entries[path]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __contains__(self, path: object) -> bool:
+        return path in self._entries
+
+    def __iter__(self) -> Iterator[Path]:
+        return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __bool__(self) -> bool:
+        return bool(self._entries)
+
+    def due(self, *, force: bool = False, policy: bool = False) -> list[Path]:
+        """
+        ###   FlushQueue - 获取待写入的文件
+        -     关键文件在前，其余按加入顺序排列，处于退避期间的文件除非 force 为 True 否则不包含在内。
+        -     policy 为 True 时，只包含满足写入策略的文件，并按条件计数。
+        """
+        _now = monotonic()
+        _due = []
+        for path, entry in self._entries.items():
+            if force:
+                _due.append(path)
+            elif entry.retry_at <= _now:
+                if not policy:
+                    _due.append(path)
+                    continue
+                _reason = self.policy.reason(entry, _now)
+                if _reason:
+                    self.policy.triggers[_reason] += 1
+                    _due.append(path)
+        return [i for i in _due if i in self.critical] + [
+            i for i in _due if i not in self.critical
+        ]
+
+    def next_deadline(self) -> Optional[float]:
+        """
+        ###   FlushQueue - 获取下一次写入的时间
+        -     按照写入策略，获取队列中最早需要写入的时间，以 `time.monotonic()` 为基准，队列为空时为 None。
+        """
+        if not self._entries:
+            return None
+        return min(self.policy.deadline(i) for i in self._entries.values())
+
+    def oldest_age(self) -> float:
+        """
+        ###   FlushQueue - 获取积压时长
+        -     获取队列中最早加入的文件已经等待的秒数，队列为空时为 0。
+        """
+        if not self._entries:
+            return 0.0
+        return monotonic() - min(i.enqueued for i in self._entries.values())
+
+    def stats(self) -> dict:
+        """
+        ###   FlushQueue - 获取队列状态
+        -     depth: 队列中的文件数量
+        -     oldest_age: 最早加入的文件已经等待的秒数
+        -     retrying: 处于重试中的文件数量
+        -     pending: 队列中尚未写入的修改次数
+        -     mutations: 累计加入队列的修改次数
+        -     writes: 累计成功写入的次数，与 mutations 之比即为写入放大
+        -     triggers: 按写入策略的条件分别计数
+        -     flushes: 累计写入了至少一个文件的 flush 次数
+        -     flush_seconds: 这些 flush 累计耗费的秒数
+        -     flushed_bytes: 这些 flush 累计写入磁盘的字节数
+        """
+        return {
+            "depth": len(self._entries),
+            "oldest_age": self.oldest_age(),
+            "retrying": sum(1 for i in self._entries.values() if i.attempts),
+            "pending": sum(i.pending for i in self._entries.values()),
+            "mutations": self.mutations,
+            "writes": self.writes,
+            "triggers": dict(self.policy.triggers),
+            "flushes": self.flushes,
+            "flush_seconds": self.flush_seconds,
+            "flushed_bytes": self.flushed_bytes,
+        }
+
+    @staticmethod
+    def _prepare(path: Path) -> Callable[[], bool]:
+        try:
+            return FileStation(path, unsafe=True).prepare_save(
+                safe=path in FileStation.journals
+            )
+        except Exception as e:
+            logger.warning(e)
+            return lambda: False
+
+    async def flush(self, *, force: bool = False, policy: bool = False) -> int:
+        """
+        ###   FlushQueue - 写入队列中的文件
+        -     在事件循环中逐批取得快照，然后在 `FileStation.executor` 中写入磁盘。
+        -     写入成功的文件移出队列，失败的文件保留在队列中并安排重试，写入期间被再次加入的文件保持在队列中。
+        -     返回写入成功的文件数量。
+
+        ###   参数
+        -     force: bool  是否忽略退避时间，写入所有文件，关闭时使用，默认为 False
+        -     policy: bool  是否只写入满足写入策略的文件，默认为 False
+        """
+        _loop = get_running_loop()
+        _paths = self.due(force=force, policy=policy)
+        _saved = 0
+        _started, _written = monotonic(), FileStation.written
+        for i in range(0, len(_paths), self.concurrency):
+            _batch = _paths[i : i + self.concurrency]
+            _entries = [self._entries.pop(path) for path in _batch]
+            _jobs = [self._prepare(path) for path in _batch]
+            _results = await gather(
+                *(_loop.run_in_executor(FileStation.executor, job) for job in _jobs)
+            )
+            for path, entry, success in zip(_batch, _entries, _results):
+                if success:
+                    _saved += 1
+                    self.writes += 1
+                    continue
+                entry.attempts += 1
+                _delay = min(self.backoff * 2 ** (entry.attempts - 1), self.max_backoff)
+                entry.retry_at = monotonic() + _delay
+                logger.warning(
+                    f"Failed to save {path}, retry #{entry.attempts} in {_delay:.0f}s"
+                )
+                self._entries.setdefault(path, entry)
+        if _paths:
+            self.flushes += 1
+            self.flush_seconds += monotonic() - _started
+            self.flushed_bytes += FileStation.written - _written
+        return _saved
+
 
 class FileStation:
     """
@@ -30,11 +1061,12 @@ class FileStation:
     -     当 FileStation 对象被创建时，它会自动在 Superfetch 中查找缓存，如果找到了，就会直接使用缓存，否则就会自动调用 load() 方法来加载文件。
     -     当 `use_superfetch` 属性设置为 True 时，FileStation 对象会自动将缓存写入 Superfetch 中。
     """
-    save_queue: set = set()
+    save_queue: FlushQueue = FlushQueue()
     """
     ###   Superfetch - 文件写入任务等待队列
     -     当 `use_superfetch` 属性设置为 True 时，save() 方法会将文件写入任务添加到等待队列中，由 AsyncIOScheduler 按顺序执行。
     -     当 `use_superfetch` 属性设置为 False 时，save() 方法会立即将文件写入磁盘，不会添加到等待队列中。
+    -     队列有序且去重，关键文件优先，写入失败的文件按指数退避重试，见 FlushQueue。
     """
     scheduler: BaseScheduler = AsyncIOScheduler()
     """
@@ -49,6 +1081,72 @@ class FileStation:
     -     这是 FileStation 对象的默认定时任务调度器。
     -     目前没什么用处，除非你知道你在做什么，否则不要修改或使用这个属性。
     """
+    dirty: dict = {}
+    """
+    ###   Superfetch - 脏数据标记
+    -     以文件路径为键，记录自上次序列化以来被修改过的字段路径，一级字段为 `key`，更深的字段为 `(key, subkey, ...)`。
+    -     仅对开启了 `track_dirty` 的文件生效，这些文件在保存时只会重新排序和序列化被修改过的部分。
+    -     开启 `track_dirty` 后，原地修改嵌套数据时必须调用 mark_dirty()，否则修改不会被写入磁盘。
+    -     位于跟踪的最后一层的值被快照按引用保存，在写入线程中才编码，因此修改这些值时应当替换为新的对象再标记。
+    """
+    depths: dict = {}
+    """
+    ###   Superfetch - 脏数据跟踪层数
+    -     以文件路径为键，记录开启了 `track_dirty` 的文件跟踪到第几层字段，未登记的文件跟踪两层。
+    -     更深的字段作为一个整体序列化，标记更深的路径等同于标记它在这一层的祖先。
+    """
+    fragments: dict = {}
+    """
+    ###   Superfetch - 序列化片段缓存
+    -     以文件路径为键，缓存上次序列化得到的片段树，见 FragmentNode，供下次保存时复用未被修改的部分。
+    """
+    sequences: dict = {}
+    """
+    ###   Superfetch - 已写入快照序号
+    -     以文件路径为键，记录最近一次写入磁盘，或确认与磁盘内容一致的快照的序号。
+    -     快照按取得的顺序编号，较旧的快照不会覆盖已经写入的较新的快照。
+    """
+    digests: dict = {}
+    """
+    ###   Superfetch - 已写入内容摘要
+    -     以文件路径为键，记录最近一次成功写入磁盘的内容摘要。
+    -     写入前内容摘要未变且文件仍然存在时，将跳过本次写入。
+    """
+    journals: dict = {}
+    """
+    ###   Superfetch - 变更日志
+    -     以文件路径为键登记的 FileJournal 对象。
+    -     对应的文件成功写入磁盘后，其变更日志已被完整包含在文件中，将被自动清空。
+    """
+    written: int = 0
+    """
+    ###   Superfetch - 写入字节数
+    -     累计写入磁盘的字节数，包括立即写入与队列写入，跳过的写入不计入。
+    """
+    locks: dict = {}
+    """
+    ###   Superfetch - 文件锁
+    -     以文件路径为键登记的 FileLock 对象，供多个进程共用同一个存档目录时使用。
+    -     登记了文件锁的文件，加载与写入都在锁内进行，写入前若发现其他进程已经提交了更新的数据，则跳过本次写入。
+    """
+    formats: dict = {}
+    """
+    ###   Superfetch - 文件格式
+    -     以文件路径为键，记录文件写入时使用的 Serializer，未登记的文件使用 `pretty` 格式。
+    -     加载时总是按照文件内容自动识别格式，因此修改格式后，下一次写入即完成转换。
+    """
+    executor: ThreadPoolExecutor = ThreadPoolExecutor(
+        max_workers=2, thread_name_prefix="FileStation"
+    )
+    """
+    ###   Superfetch - 文件写入线程池
+    -     policy_job() 与 save_job() 在这个容量有限的线程池中执行写入任务，避免阻塞事件循环。
+    """
+    _numbers: Iterator[int] = count()
+    """
+    ###   Superfetch - 快照序号
+    -     为 prepare_save() 取得的快照编号，见 `FileStation.sequences`。
+    """
     _tempdir: Path = Path(mkdtemp())
     """
     ###   FileStation - 临时文件目录
@@ -57,42 +1155,61 @@ class FileStation:
 
     async def save_job(*args) -> None:
         """
-        ###   Superfetch - 定时任务
-        -     定时任务，每隔一分钟检查一次等待队列，如果有文件需要写入，就将其写入磁盘。
-        -     如果等待队列中的文件已经写入磁盘，就将其从等待队列中移除。
-        -     如果一次检查完成后，等待队列中还有文件，将通过警告日志输出剩余任务的数量。
+        ###   Superfetch - 立即写入全部文件
+        -     不经过定时任务，也不考虑写入策略，立即将等待队列中的全部文件写入磁盘，用于需要手动落盘的场合，如基准测试。
+        -     定时写入由 policy_job() 负责，本方法不会被调度。
+        -     如果写入完成后等待队列中还有文件，将通过警告日志输出剩余任务的数量。
+        -     快照在事件循环中取得，只复制数据的结构，编码、计算摘要、拼接与磁盘写入都交给 `FileStation.executor` 执行，不会阻塞事件循环。
         """
         _len = len(FileStation.save_queue)
         if _len:
             logger.opt(colors=True).warning(
-                f"<y>FileStation</y> is now saving {_len} files."
+                f"<y>FileStation</y> is now saving {_len} files, "
+                f"the oldest has waited {FileStation.save_queue.oldest_age():.0f}s."
             )
-            while _len:
-                success = FileStation(
-                    list(FileStation.save_queue)[0], unsafe=True
-                ).do_save()
-                if success:
-                    # logger.success(f"Saved {list(FileStation.save_queue)[0]}")
-                    FileStation.save_queue.remove(list(FileStation.save_queue)[0])
-                    _len -= 1
-                else:
-                    logger.warning(f"Failed to save {list(FileStation.save_queue)[0]}")
-                    try:
-                        _success = FileStation(
-                            list(FileStation.save_queue)[1]
-                        ).do_save()
-                        if _success:
-                            FileStation.save_queue.remove(
-                                list(FileStation.save_queue)[1]
-                            )
-                            _len -= 1
-                    except IndexError:
-                        break
+            await FileStation.save_queue.flush()
         if FileStation.save_queue:
             logger.warning(f"{len(FileStation.save_queue)} files not saved")
         else:
             logger.success("All files saved")
 
+    async def policy_job(*args) -> None:
+        """
+        ###   Superfetch - 按写入策略执行的定时任务
+        -     只写入满足写入策略的文件，然后按照剩余文件重新安排下一次执行的时间。
+        -     队列为空时不会安排任务，空闲的 Bot 不会被定时唤醒。
+        """
+        await FileStation.save_queue.flush(policy=True)
+        FileStation.schedule_flush()
+
+    @staticmethod
+    def schedule_flush() -> None:
+        """
+        ###   Superfetch - 安排写入任务
+        -     按照 `FileStation.save_queue` 的写入策略，将 policy_job() 安排在最早需要写入的时间执行。
+        -     已经安排的时间更早时保持不变。
+        """
+        _deadline = FileStation.save_queue.next_deadline()
+        _job = FileStation.scheduler.get_job("FileStation.policy_job")
+        if _deadline is None:
+            if _job:
+                _job.remove()
+            return
+        _run_date = datetime.now().astimezone() + timedelta(
+            seconds=max(0.0, _deadline - monotonic())
+        )
+        _next = getattr(_job, "next_run_time", None)
+        if _next and _next <= _run_date:
+            return
+        FileStation.scheduler.add_job(
+            FileStation.policy_job,
+            "date",
+            run_date=_run_date,
+            misfire_grace_time=None,
+            id="FileStation.policy_job",
+            replace_existing=True,
+        )
+
     def __init__(
         self,
         filepath: str | Path = None,
@@ -102,6 +1219,9 @@ class FileStation:
         use_superfetch: bool = False,
         scheduler: BaseScheduler = None,
         unsafe: bool = False,
+        track_dirty: bool | int = False,
+        serializer: Optional[str | Serializer] = None,
+        lazy: bool = False,
     ) -> None:
         """
         ###   FileStation - 构造函数
@@ -125,6 +1245,11 @@ class FileStation:
         -     json_string: str  JSON 字符串，默认为 None
         -     `use_superfetch`: bool  是否使用 Superfetch，默认为 False
         -     scheduler: BaseScheduler  自定义定时任务调度器，默认为 None
+        -     `track_dirty`: bool | int  是否只重新排序和序列化被修改过的部分，默认为 False
+            -     为整数时表示跟踪到第几层字段，True 等同于 2，见 `FileStation.depths`
+        -     serializer: str | Serializer  写入文件时使用的格式，可选值为 `pretty`, `compact`, `binary`，默认为 None，即保持原有格式
+        -     lazy: bool  是否延迟解码 binary 格式的文件，只在第一次访问时解码用到的部分，默认为 False
+            -     需要配合 `module_name` 或 unsafe 使用，否则创建 self.data 时会解码全部数据
         """
         if isinstance(filepath, Path):
             self._filepath = filepath.resolve()
@@ -136,7 +1261,15 @@ class FileStation:
         self._json_string = json_string
         self._use_superfetch = use_superfetch
         self._unsafe = unsafe
+        self._lazy = lazy
+        if track_dirty and self._filepath:
+            FileStation.dirty.setdefault(self._filepath, set())
+            FileStation.depths[self._filepath] = (
+                2 if track_dirty is True else track_dirty
+            )
         self.load()
+        if serializer and self._filepath:
+            self.serializer = get_serializer(serializer)
         if scheduler:
             logger.warning(
                 f"Switching scheduler from {FileStation.scheduler.__class__.__name__} to {scheduler.__class__.__name__}"
@@ -184,14 +1317,14 @@ class FileStation:
         ###   FileStation - 提取数据
         -     如果提供了 `module_name` 参数，就在初始化 FileStation 对象时，自动将对应模块的数据填充到 self.data 中。
         -     如果将 unsafe 参数设置为 True，将使用旧方法来提取数据，即直接把 self.data 创建为 `self._data` 的引用，以满足兼容性或性能用途。
-        -     否则，将所有数据即 `self._data` 变换填充到 self.data 中。
+        -     否则，将 self.data 创建为 `self._data` 的写时复制视图，见 CowMapping，对 self.data 的修改不会影响 `self._data`。
         """
         if self._module_name:
             self.data = self._data.get(self._module_name, {})
         elif self._unsafe:
             self.data = self._data
         else:
-            self.data = loadJsonS(dumpJsonS(self._data))
+            self.data = CowMapping(self._data)
 
     def _load_from_superfetch(self) -> None:
         """
@@ -219,14 +1352,46 @@ class FileStation:
         ###   FileStation - 从 JSON 文件中加载数据
         -     如果提供了 filepath 参数，就从文件中加载数据来初始化 FileStation 对象。
         -     如果 filepath 参数为 None 或者文件不存在，就创建一个空的 FileStation 对象。
+        -     加载之前先处理上次写入中断时遗留的副本。
+        -     登记了文件锁的文件在锁内加载，并记录加载时的版本号。
+        -     文件格式按照文件开头的标识或扩展名自动识别，未指定格式时，之后的写入沿用识别出的格式。
+        -     开启了 lazy 的 binary 格式文件会被映射到内存中，较大的字典在第一次访问时才解码，见 LazyMapping。
         """
         if self._filepath:
-            try:
-                with open(self._filepath, "r", encoding="utf-8") as f:
-                    self._data = loadJson(f)
-            except FileNotFoundError:
-                logger.warning(f"File {self._filepath} not found")
-                self._data = {}
+            _lock = FileStation.locks.get(self._filepath)
+            with _lock.acquire() if _lock else nullcontext():
+                if _lock:
+                    _lock.known = _lock.generation()
+                self._load_from_file()
+
+    def _load_from_file(self) -> None:
+        try:
+            recover_safe(self._filepath)
+        except OSError as e:
+            logger.error(e)
+        try:
+            with open(self._filepath, "rb") as f:
+                _raw = self._map(f) if self._lazy else f.read()
+            _serializer = detect(_raw[:16], self._filepath)
+            if self._lazy and isinstance(_serializer, Binary):
+                self._data = _serializer.loads(_raw, lazy=True)
+            else:
+                self._data = _serializer.loads(bytes(_raw))
+            FileStation.formats.setdefault(self._filepath, _serializer)
+        except FileNotFoundError:
+            logger.warning(f"File {self._filepath} not found")
+            self._data = {}
+
+    @staticmethod
+    def _map(f: Any) -> bytes | mmap:
+        """
+        ###   FileStation - 映射文件
+        -     以只读方式将文件映射到内存中，文件被替换后映射仍然指向原来的内容。
+        -     Windows 无法替换已被映射的文件，空文件也无法映射，这两种情况下直接读取文件。
+        """
+        if osName == "nt" or not fstat(f.fileno()).st_size:
+            return f.read()
+        return mmap(f.fileno(), 0, access=ACCESS_READ)
 
     def save(self, *, snapshot: bool = False) -> bool:
         """
@@ -237,11 +1402,15 @@ class FileStation:
         -     当 `use_superfetch` 属性设置为 False 时，立即将文件写入磁盘，不会添加到等待队列中。
         """
         if self._filepath:
-            self.sort()
+            if self._filepath in FileStation.dirty:
+                self._sort_dirty()
+            else:
+                self.sort()
             if snapshot:
                 if Path(self._filepath).exists():
                     now = datetime.now().strftime(r"%Y%m%d-%H%M%S-%f")[:-3]
-                    rename(self._filepath, f"{str(self._filepath)[:-5]}-{now}.json")
+                    _path = Path(self._filepath)
+                    rename(_path, _path.with_name(f"{_path.stem}-{now}{_path.suffix}"))
             if self._use_superfetch or self._filepath in FileStation.superfetch:
                 FileStation.superfetch[self._filepath] = self._data
                 FileStation.save_queue.add(self._filepath)
@@ -266,6 +1435,37 @@ class FileStation:
         elif not Path(dir).exists():
             makedirs(dir, exist_ok=True)
 
+    @property
+    def serializer(self) -> Serializer:
+        """
+        ###   FileStation - 文件格式
+        -     写入文件时使用的格式，修改后会丢弃已缓存的片段与摘要，下一次写入时转换为新的格式。
+        """
+        return FileStation.formats.get(self._filepath, serializers["pretty"])
+
+    @serializer.setter
+    def serializer(self, serializer: Serializer) -> None:
+        if self.serializer is not serializer:
+            FileStation.formats[self._filepath] = serializer
+            FileStation.fragments.pop(self._filepath, None)
+            FileStation.digests.pop(self._filepath, None)
+            if self._filepath in FileStation.dirty:
+                FileStation.dirty[self._filepath].update(self._data)
+
+    def export(self, filepath: Optional[str | Path] = None) -> Path:
+        """
+        ###   FileStation - 导出数据
+        -     将 self._data 以缩进为 4 的 JSON 格式写入到另一个文件中，便于阅读，不影响原文件的格式。
+        -     返回导出的文件路径。
+
+        ###   参数
+        -     filepath: str | Path  导出的文件路径，默认为 None，即原文件同目录下的 `<文件名>.export.json`
+        """
+        _path = Path(filepath or f"{self._filepath}.export.json")
+        _path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(_path, serializers["pretty"].dumps(self._data))
+        return _path
+
     def _check_dir(self) -> None:
         """
         ###   FileStation - 检查目录
@@ -277,40 +1477,295 @@ class FileStation:
     def do_save(self) -> bool:
         """
         ###   FileStation - 保存数据
-        -     将数据覆盖写入到文件中。
+        -     将数据写入到副本中，然后原子地替换原文件，不进行 fsync。
+        -     原文件不会被读到只写了一半的状态，但断电时可能丢失最近一次写入，因此不会清空变更日志。
         """
-        try:
-            self._check_dir()
-            with open(self._filepath, "w", encoding="utf-8") as f:
-                dumpJson(self._data, f, ensure_ascii=False, indent=4)
-                return True
-        except Exception as e:
-            logger.warning(
-                e
-            ) if self._filepath in FileStation.superfetch else logger.error(e)
-            return False
+        return self.prepare_save()()
 
-    def do_save_safe(self) -> None:
+    def do_save_safe(self) -> bool:
         """
         ###   FileStation - 保存数据
-        -     将数据覆盖写入到副本中，然后删除原文件，再将副本重命名为原文件名。
+        -     将数据写入到副本中并 fsync，然后原子地替换原文件，再 fsync 所在目录。
+        """
+        return self.prepare_save(safe=True)()
+
+    def prepare_save(self, *, safe: bool = False) -> Callable[[], bool]:
+        """
+        ###   FileStation - 准备写入
+        -     在当前线程中取得 self._data 的不可变快照，返回一个可以在任意线程中执行的写入任务。
+        -     快照取得之后，self._data 可以继续被修改，不会影响本次写入，变更日志也只会清空到快照为止。
+        -     只有 fsync 过的写入才会清空变更日志。
+        -     写入任务返回 True 表示写入成功，或者内容未变、已有更新的快照写入而跳过了写入。
+
+        ###   参数
+        -     safe: bool  是否 fsync 写入的文件与目录，默认为 False
         """
+        _serializer = self.serializer
         try:
-            self._check_dir()
-            with open(f"{self._filepath}_safe", "w", encoding="utf-8") as f:
-                dumpJson(self._data, f, ensure_ascii=False, indent=4)
-            try:
-                remove(self._filepath)
-            except FileNotFoundError:
-                pass
-            rename(f"{self._filepath}_safe", self._filepath)
-            return True
+            _snapshot = self._snapshot()
         except Exception as e:
-            logger.warning(
-                e
-            ) if self._filepath in FileStation.superfetch else logger.error(e)
+            self._log_save_error(e)
+            return lambda: False
+        _journal = FileStation.journals.get(self._filepath)
+        _upto = _journal.position() if _journal else None
+        _number = next(FileStation._numbers)
+        return partial(self._write, _serializer, _snapshot, _number, _upto, safe)
+
+    def _write(
+        self,
+        serializer: Serializer,
+        snapshot: Fragment | FragmentNode,
+        number: int,
+        upto: int | None,
+        safe: bool,
+    ) -> bool:
+        """
+        ###   FileStation - 写入快照
+        -     只读取快照与 `self._filepath`，因此可以在事件循环之外的线程中执行，编码、计算摘要与拼接都在这里进行。
+        -     在 write_lock() 内进行，同一个文件同时只有一个写入任务，已经写入了更新的快照时跳过写入。
+        -     内容摘要与最近一次写入时相同，且文件仍然存在时跳过写入。
+        -     跳过写入时，若要求 fsync，则 fsync 已有的文件，然后同样清空变更日志。
+        -     登记了文件锁的文件，其他进程已经提交了更新的数据时跳过写入，更新的数据将由那个进程写入。
+        """
+        _lock = FileStation.locks.get(self._filepath)
+        try:
+            with write_lock(self._filepath), (
+                _lock.acquire() if _lock else nullcontext()
+            ):
+                if _lock and _lock.generation() != _lock.known:
+                    logger.debug(f"Skipped saving stale {self._filepath}")
+                    return True
+                _skipped = None
+                if FileStation.sequences.get(self._filepath, -1) > number:
+                    _skipped = "outdated"
+                else:
+                    _digest = self._digest_of(serializer, snapshot)
+                    if (
+                        FileStation.digests.get(self._filepath) == _digest
+                        and self._filepath.exists()
+                    ):
+                        _skipped = "unchanged"
+                        FileStation.sequences[self._filepath] = number
+                if _skipped:
+                    logger.debug(f"Skipped saving {_skipped} {self._filepath}")
+                    if safe:
+                        sync_file(self._filepath)
+                        self._compact_journal(upto)
+                    return True
+                self._check_dir()
+                _raw = self._render(serializer, snapshot)
+                atomic_write(self._filepath, _raw, durable=safe)
+                FileStation.written += len(_raw)
+                FileStation.digests[self._filepath] = _digest
+                FileStation.sequences[self._filepath] = number
+                if safe:
+                    self._compact_journal(upto)
+                return True
+        except Exception as e:
+            self._log_save_error(e)
             return False
 
+    def _log_save_error(self, e: Exception) -> None:
+        (
+            logger.warning(e)
+            if self._filepath in FileStation.superfetch
+            else logger.error(e)
+        )
+
+    def mark_dirty(self, key: str, *subkeys: str) -> None:
+        """
+        ###   FileStation - 标记脏数据
+        -     标记 `self._data[key]` 或 `self._data[key][subkey]...` 已被修改，仅对开启了 `track_dirty` 的文件生效。
+
+        ###   参数
+        -     key: str  一级字段
+        -     subkeys: str  更深的字段，依次给出路径，默认为空，即整个一级字段
+        """
+        if self._filepath in FileStation.dirty:
+            FileStation.dirty[self._filepath].add((key, *subkeys) if subkeys else key)
+
+    def _sort_dirty(self) -> None:
+        """
+        ###   FileStation - 增量排序
+        -     只对被标记的一级字段排序其二级字典，并且只在顺序确实改变时重建字典。
+        -     一级字典同样只在顺序改变时重建。
+        -     重建了二级字典的一级字段整个标记为已修改，以便片段树按照新的顺序重建。
+        """
+        _dirty = FileStation.dirty[self._filepath]
+        for key in {i if isinstance(i, str) else i[0] for i in _dirty}:
+            value = self._data.get(key)
+            if isinstance(value, LazyMapping) and list(value) != sorted(value):
+                value.reorder(sorted(value))
+                _dirty.add(key)
+            elif isinstance(value, dict) and list(value) != sorted(value):
+                self._data[key] = {k: value[k] for k in sorted(value)}
+                _dirty.add(key)
+        if list(self._data) != sorted(self._data):
+            _sorted = {k: self._data[k] for k in sorted(self._data)}
+            self._data.clear()
+            self._data.update(_sorted)
+
+    def _serialize(self) -> bytes:
+        """
+        ###   FileStation - 序列化
+        -     将 self._data 按照该文件的格式序列化。
+        -     开启了 `track_dirty` 的文件会复用未被修改部分的序列化片段，结果与完整序列化一致。
+        """
+        return self._render(self.serializer, self._snapshot())
+
+    def _snapshot(self) -> Fragment | FragmentNode:
+        """
+        ###   FileStation - 取得快照
+        -     返回 self._data 的不可变快照，可交给 _render() 拼接为完整文件，或交给 _digest_of() 计算摘要。
+        -     这里只复制数据的结构，编码与计算摘要都推迟到读取快照时进行，因此可以交给事件循环之外的线程。
+        -     开启了 `track_dirty` 的文件，快照为片段树，见 FragmentNode，只复制从根节点到被标记的路径上的节点，
+              被标记的值按引用保存，未被修改的子树连同编码结果与摘要直接复用。
+        -     否则快照为 self._data 的深拷贝，见 `deep_copy`。
+        """
+        if self._filepath not in FileStation.dirty or not all(
+            isinstance(k, str) for k in self._data
+        ):
+            return Fragment(None, deep_copy(self._data), 0)
+        _dirty = FileStation.dirty[self._filepath]
+        _limit = FileStation.depths.get(self._filepath, 2)
+        _paths = {}
+        for i in _dirty:
+            _path = (i,) if isinstance(i, str) else i[:_limit]
+            _node = _paths
+            for key in _path[:-1]:
+                _node = _node.setdefault(key, {})
+                if _node is True:
+                    break
+            else:
+                _node[_path[-1]] = True
+        _tree = self._fragment(
+            None,
+            self._data,
+            0,
+            _limit,
+            FileStation.fragments.get(self._filepath),
+            _paths,
+        )
+        _dirty.clear()
+        FileStation.fragments[self._filepath] = _tree
+        return _tree
+
+    def _fragment(
+        self,
+        key: Optional[str],
+        value: Any,
+        depth: int,
+        limit: int,
+        cached: Optional[Fragment | FragmentNode] = None,
+        dirty: Optional[dict | bool] = True,
+    ) -> Fragment | FragmentNode:
+        """
+        ###   FileStation - 取得片段
+        -     为位于第 depth 层的键值对创建片段，不深于 limit 层、键均为字符串的字典创建为 FragmentNode。
+        -     dirty 为被修改过的子路径，True 表示整个 value 都需要重新创建，None 表示 value 未被修改，直接返回 cached。
+        -     只有部分子路径被修改时，复制 cached 的子节点，只替换被修改的部分。
+        """
+        if dirty is None and cached is not None:
+            return cached
+        _rebuild = (
+            dirty is None or dirty is True or not isinstance(cached, FragmentNode)
+        )
+        if key is not None and (
+            depth >= limit
+            or not isinstance(value, (dict, LazyMapping))
+            or (_rebuild and not all(isinstance(k, str) for k in value))
+        ):
+            return Fragment(key, value, depth)
+        if (
+            _rebuild
+            and isinstance(value, LazyMapping)
+            and isinstance(self.serializer, Binary)
+        ):
+            return FragmentNode(
+                key,
+                {
+                    k: (
+                        self._fragment(k, value[k], depth + 1, limit)
+                        if _raw is None
+                        else Fragment(k, None, depth + 1, _raw)
+                    )
+                    for k, _raw in value.encoded()
+                },
+                depth,
+            )
+        elif _rebuild and depth + 1 >= limit:
+            return FragmentNode(
+                key, {k: Fragment(k, v, depth + 1) for k, v in value.items()}, depth
+            )
+        elif _rebuild:
+            return FragmentNode(
+                key,
+                {k: self._fragment(k, v, depth + 1, limit) for k, v in value.items()},
+                depth,
+            )
+        _children = dict(cached.children)
+        _added = False
+        for k, _sub in dirty.items():
+            if k not in value:
+                _children.pop(k, None)
+                continue
+            _added |= k not in _children
+            _children[k] = self._fragment(
+                k, value[k], depth + 1, limit, _children.get(k), _sub
+            )
+        if (_added or not depth) and list(_children) != list(value):
+            _children = {
+                k: (
+                    _children[k]
+                    if k in _children
+                    else self._fragment(k, value[k], depth + 1, limit)
+                )
+                for k in value
+            }
+        return FragmentNode(key, _children, depth)
+
+    def _render(
+        self, serializer: Serializer, snapshot: Fragment | FragmentNode
+    ) -> bytes:
+        """
+        ###   FileStation - 拼接快照
+        -     将 _snapshot() 返回的快照按照 serializer 编码，拼接为完整的文件内容。
+        """
+        _chunks = [serializer.header]
+        if isinstance(snapshot, FragmentNode):
+            snapshot.render(serializer, _chunks)
+        else:
+            _chunks.append(snapshot.raw(serializer))
+        return b"".join(_chunks)
+
+    @staticmethod
+    def _digest_of(serializer: Serializer, snapshot: Fragment | FragmentNode) -> str:
+        """
+        ###   FileStation - 快照的内容摘要
+        -     由格式名称与快照的摘要组合而成，未被修改的片段不会重新计算摘要。
+        """
+        _digest = blake2b(serializer.name.encode(), digest_size=16)
+        _digest.update(snapshot.digest(serializer))
+        return _digest.hexdigest()
+
+    def _digest(self) -> str:
+        """
+        ###   FileStation - 获取内容摘要
+        -     获取 self._data 稳定的内容摘要，与进程、运行次数无关。
+        """
+        return self._digest_of(self.serializer, self._snapshot())
+
+    def _compact_journal(self, upto: Optional[int] = None) -> None:
+        """
+        ###   FileStation - 压缩变更日志
+        -     文件写入磁盘后，清空登记在 `FileStation.journals` 中的对应变更日志。
+
+        ###   参数
+        -     upto: int  只清空前 upto 个字节，即取得快照时已提交的变更，默认为 None，即全部清空
+        """
+        if self._filepath in FileStation.journals:
+            FileStation.journals[self._filepath].truncate(upto)
+
     def sort(self, **kwargs) -> None:
         """
         ###   FileStation - 排序
@@ -416,6 +1871,7 @@ class FileStation:
         """
         if key not in self.data:
             self.data[key] = value
+            self._mark_data_dirty(key)
             return True
         else:
             logger.warning(f"'{key}' already exists")
@@ -433,6 +1889,7 @@ class FileStation:
         """
         if key not in self._data:
             self._data[key] = value
+            self.mark_dirty(key)
             return True
         else:
             logger.warning(f"'{key}' already exists")
@@ -448,6 +1905,13 @@ class FileStation:
         -     value: 更新的值。
         """
         self.data[key] = value
+        self._mark_data_dirty(key)
+
+    def _mark_data_dirty(self, key: str) -> None:
+        if self._module_name:
+            self.mark_dirty(self._module_name, key)
+        else:
+            self.mark_dirty(key)
 
     def _update(self, key: str, value: Any) -> None:
         """
@@ -459,6 +1923,7 @@ class FileStation:
         -     value: 更新的值。
         """
         self._data[key] = value
+        self.mark_dirty(key)
 
     def get(self, key: str, default: Any = None) -> Any:
         """
@@ -538,29 +2003,62 @@ class FileStation:
         """
         return len(self._data)
 
-    def memory(self) -> int:
+    def memory(self, *, deep: bool = True) -> int:
         """
         ###   FileStation - 获取内存占用
-        -     获取 self.data 的内存占用。
+        -     获取 self.data 的内存占用，包括其中所有的键、值与元素，见 `deep_sizeof`。
+        ###   参数
+        -     deep: bool  为 False 时只计算最外层的字典，默认为 True。
         """
-        return getsizeof(self.data)
+        return deep_sizeof(self.data) if deep else getsizeof(self.data)
 
-    def _memory(self) -> int:
+    def _memory(self, *, deep: bool = True) -> int:
         """
         ###   FileStation - 获取内存占用
-        -     获取 self._data 的内存占用。
+        -     获取 self._data 的内存占用，包括其中所有的键、值与元素，见 `deep_sizeof`。
+        ###   参数
+        -     deep: bool  为 False 时只计算最外层的字典，默认为 True。
+        """
+        return deep_sizeof(self._data) if deep else getsizeof(self._data)
+
+    @staticmethod
+    def memory_report() -> dict[Path, int]:
+        """
+        ###   Superfetch - 获取内存占用
+        -     按文件路径获取 Superfetch 中每个文件的内存占用，从大到小排列。
+        -     每个文件单独计算，多个文件共用的对象（如驻留的字符串）在每个文件中都会计入。
+        """
+        _report = {k: deep_sizeof(v) for k, v in FileStation.superfetch.items()}
+        return dict(sorted(_report.items(), key=lambda i: -i[1]))
+
+    def compact(self, *, freeze: bool = False) -> tuple[int, int]:
+        """
+        ###   FileStation - 压缩内存
+        -     驻留 self._data 中所有的字符串，见 `compact`，内容不变，不会标记脏数据。
+        -     返回压缩前后 self._data 的内存占用。
+        ###   参数
+        -     freeze: bool  是否将列表转换为元组，只应对不会原地修改列表的数据使用，默认为 False。
         """
-        return getsizeof(self._data)
+        _before = self._memory()
+        for k, v in list(self._data.items()):
+            self._data[k] = compact(v, freeze=freeze)
+        return _before, self._memory()
 
     def reload(self, *, full: bool = False) -> None:
         """
         ###   FileStation - 重新加载数据
         -     重新加载 self.data 中的数据。
+        -     full 为 True 时丢弃 Superfetch 中的缓存，从磁盘重新加载，用于读取其他进程写入的数据。
         ###   参数
         -     full: bool  是否重新加载所有数据，默认为 False。
         """
         if full:
+            FileStation.superfetch.pop(self._filepath, None)
+            FileStation.fragments.pop(self._filepath, None)
+            FileStation.digests.pop(self._filepath, None)
             self.load()
+            if self._filepath in FileStation.dirty:
+                FileStation.dirty[self._filepath].update(self._data)
         else:
             self._extract_data()
 
@@ -649,6 +2147,244 @@ class FileStation:
         return _path
 
 
+class FileJournal:
+    """
+    ##    FileJournal - 追加写入的变更日志
+    -     为一个 FileStation 文件记录增量变更，每条变更为一行 JSON，保存在 `<filepath>.journal` 中。
+    -     append() 只写入内存缓冲，commit() 时统一写入磁盘并 fsync，一次事务只需一次 fsync。
+    -     文件本身写入磁盘后，变更日志即可被清空，见 `FileStation.journals`。
+    """
+
+    def __init__(self, filepath: str | Path) -> None:
+        """
+        ###   FileJournal - 构造函数
+
+        ###   参数
+        -     filepath: str | Path  被记录的文件路径，变更日志保存在同目录下
+        """
+        self._filepath = Path(f"{Path(filepath).resolve()}.journal")
+        self._pending: list[str] = []
+        self._lock = Lock()
+        self._base = 0
+        self._recover()
+        FileStation.journals[Path(filepath).resolve()] = self
+
+    def _recover(self) -> None:
+        """
+        ###   FileJournal - 处理遗留的副本
+        -     truncate() 中断时会遗留 `_safe` 副本，日志本身仍然完整时删除副本，否则用副本替换日志。
+        -     副本中不完整的行会在 replay() 时被跳过。
+        """
+        _safe = Path(f"{self._filepath}_safe")
+        try:
+            if not _safe.exists():
+                return
+            elif self._filepath.exists():
+                remove(_safe)
+            else:
+                replace(_safe, self._filepath)
+        except OSError as e:
+            logger.error(e)
+
+    def append(self, entry: dict) -> None:
+        """
+        ###   FileJournal - 追加变更
+        -     将一条变更加入缓冲，调用 commit() 后才会写入磁盘。
+        """
+        _line = dumpJsonS(entry, ensure_ascii=False)
+        with self._lock:
+            self._pending.append(_line)
+
+    def commit(self) -> bool:
+        """
+        ###   FileJournal - 提交变更
+        -     将缓冲中的变更追加写入磁盘并 fsync，成功后返回 True。
+        -     可以在其他线程中执行，写入期间追加的变更留待下一次提交，写入失败的变更放回缓冲。
+        """
+        with self._lock:
+            _batch, self._pending = self._pending, []
+            if not _batch:
+                return True
+            try:
+                self._filepath.parent.mkdir(parents=True, exist_ok=True)
+                with open(self._filepath, "a", encoding="utf-8") as f:
+                    f.write("\n".join(_batch) + "\n")
+                    f.flush()
+                    fsync(f.fileno())
+                return True
+            except Exception as e:
+                self._pending[:0] = _batch
+                logger.error(e)
+                return False
+
+    def replay(self) -> Iterator[dict]:
+        """
+        ###   FileJournal - 重放变更
+        -     按写入顺序逐条返回磁盘上的变更。
+        -     崩溃时可能残留不完整的最后一行，这样的行会被跳过。
+        """
+        try:
+            with open(self._filepath, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield loadJsonS(line)
+                    except ValueError:
+                        logger.warning(f"Skipped a torn entry in {self._filepath}")
+        except FileNotFoundError:
+            return
+
+    def truncate(self, upto: Optional[int] = None) -> None:
+        """
+        ###   FileJournal - 清空变更日志
+        -     仅在被记录的文件已经写入磁盘后调用。
+        -     可以在其他线程中调用，与 commit() 互斥。
+
+        -     清空的位置以 position() 计，已经被清空的部分不会重复计算，因此较早取得的位置同样有效。
+
+        ###   参数
+        -     upto: int  只清空到 position() 曾经返回的 upto 为止，之后提交的变更会被保留，默认为 None，即全部清空
+        """
+        with self._lock:
+            try:
+                _size = self._filepath.stat().st_size
+                if upto is None or self._base + _size <= upto:
+                    remove(self._filepath)
+                    self._base += _size
+                    return
+                _cut = upto - self._base
+                if _cut <= 0:
+                    return
+                with open(self._filepath, "rb") as f:
+                    f.seek(_cut)
+                    _rest = f.read()
+                atomic_write(self._filepath, _rest)
+                self._base += _cut
+            except FileNotFoundError:
+                pass
+
+    def size(self) -> int:
+        """
+        ###   FileJournal - 获取大小
+        -     获取磁盘上变更日志的字节数。
+        """
+        try:
+            return self._filepath.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def position(self) -> int:
+        """
+        ###   FileJournal - 获取位置
+        -     获取变更日志累计写入的字节数，即磁盘上的字节数加上已经被清空的字节数，作为 truncate() 的参数。
+        -     清空一部分之后，较早取得的位置仍然指向同一条变更。
+        """
+        return self._base + self.size()
+
+
+class FileLock:
+    """
+    ##    FileLock - 跨进程的文件锁与版本号
+    -     为一个 FileStation 文件提供建议性文件锁，锁文件为同目录下的 `<filepath>.lock`，供多个进程共用同一个存档目录时使用。
+    -     锁文件的内容为版本号，每次提交修改后由 bump() 加一，其他进程可以据此判断内存中的数据是否已经过时。
+    -     POSIX 下使用 fcntl，Windows 下使用 msvcrt。
+    -     同一线程内可以重入，同一进程内的其他线程会等待锁被释放。
+    """
+
+    def __init__(self, filepath: str | Path) -> None:
+        """
+        ###   FileLock - 构造函数
+
+        ###   参数
+        -     filepath: str | Path  被保护的文件路径，锁文件保存在同目录下
+        """
+        self._filepath = Path(f"{Path(filepath).resolve()}.lock")
+        self._local = RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+        self.known = 0
+        """内存中的数据对应的版本号"""
+        FileStation.locks[Path(filepath).resolve()] = self
+
+    @contextmanager
+    def acquire(self, *, blocking: bool = True) -> Iterator[bool]:
+        """
+        ###   FileLock - 获取锁
+        -     以独占方式锁定锁文件，退出上下文时释放，上下文的值为是否获取到了锁。
+        -     blocking 为 False 时不等待，锁被本进程的其他线程或其他进程持有时，上下文的值为 False，此时不持有锁。
+
+        ###   参数
+        -     blocking: bool  是否等待锁被释放，默认为 True
+        """
+        if not self._local.acquire(blocking=blocking):
+            yield False
+            return
+        try:
+            if not self._depth:
+                self._filepath.parent.mkdir(parents=True, exist_ok=True)
+                self._fd = openFd(self._filepath, O_RDWR | O_CREAT)
+                try:
+                    if flock:
+                        flock(self._fd, LOCK_EX if blocking else LOCK_EX | LOCK_NB)
+                    else:
+                        lseek(self._fd, 0, 0)
+                        locking(self._fd, LK_LOCK if blocking else LK_NBLCK, 1)
+                except BaseException as e:
+                    close(self._fd)
+                    self._fd = None
+                    if blocking or not isinstance(e, OSError):
+                        raise
+            if self._fd is None:
+                yield False
+                return
+            self._depth += 1
+            try:
+                yield True
+            finally:
+                self._depth -= 1
+                if not self._depth:
+                    if flock:
+                        flock(self._fd, LOCK_UN)
+                    else:
+                        lseek(self._fd, 0, 0)
+                        locking(self._fd, LK_UNLCK, 1)
+                    close(self._fd)
+                    self._fd = None
+        finally:
+            self._local.release()
+
+    def generation(self) -> int:
+        """
+        ###   FileLock - 读取版本号
+        -     仅在持有锁时调用。
+        """
+        lseek(self._fd, 0, 0)
+        _raw = readFd(self._fd, 32).strip()
+        return int(_raw) if _raw.isdigit() else 0
+
+    def bump(self) -> int:
+        """
+        ###   FileLock - 版本号加一
+        -     仅在持有锁时调用，返回新的版本号，并记录为内存中的数据对应的版本号。
+        """
+        self.known = self.generation() + 1
+        _raw = f"{self.known}".encode()
+        lseek(self._fd, 0, 0)
+        writeFd(self._fd, _raw)
+        ftruncate(self._fd, len(_raw))
+        return self.known
+
+    def stamp(self) -> Optional[tuple[int, int, int]]:
+        """
+        ###   FileLock - 获取锁文件的状态
+        -     返回锁文件的修改时间、inode 与大小，不需要持有锁，用于低成本地发现其他进程的提交。
+        """
+        try:
+            _stat = self._filepath.stat()
+        except FileNotFoundError:
+            return None
+        return _stat.st_mtime_ns, _stat.st_ino, _stat.st_size
+
+
 if __name__ == "__main__":
     """
     ###   FileStation - 测试
@@ -781,20 +2517,402 @@ if __name__ == "__main__":
         assert fs.bool() is True, fs.bool()
         logger.success(f"Memory usage: {fs.memory()} bytes")
 
-    def vacuum() -> None:
+    def test_journal() -> Optional[AssertionError]:
         """
-        ###   FileStation - 测试垃圾回收
+        ###   FileJournal - 测试变更日志
         """
+        fj = FileJournal(test_filepath)
+        fj.append({"a": 1})
+        fj.append({"b": [2, "二"]})
+        assert list(fj.replay()) == [], list(fj.replay())
+        assert fj.commit() is True
+        with open(f"{Path(test_filepath).resolve()}.journal", "a") as f:
+            f.write('{"c":')
+        assert list(fj.replay()) == [{"a": 1}, {"b": [2, "二"]}], list(fj.replay())
+        fs = FileStation(test_filepath)
+        assert fs.do_save_safe() is True
+        assert fj.size() == 0 and list(fj.replay()) == [], fj.size()
+        fj.append({"d": 4})
+        fj.commit()
+        _first = fj.position()
+        fj.append({"e": 5})
+        fj.commit()
+        _second = fj.position()
+        fj.append({"f": 6})
+        fj.commit()
+        fj.truncate(_second)
+        fj.truncate(_first)
+        assert list(fj.replay()) == [{"f": 6}], list(fj.replay())
+        assert fs.do_save() is True and fj.size() > 0, fj.size()
+        fj.truncate()
+        del FileStation.journals[Path(test_filepath).resolve()]
+
+    def test_track_dirty() -> Optional[AssertionError]:
+        """
+        ###   FileStation - 测试增量序列化
+        """
+        fs = FileStation(test_filepath, track_dirty=True)
+        fs._data.clear()
+        fs._insert("m", {"b": {"x": [1, "二/三"]}, "a": {}, "c": 0})
+        fs._insert("e", {})
+        fs._insert("d", [])
+        assert fs.save() is True
+        assert list(fs._data) == ["d", "e", "m"], list(fs._data)
+        assert list(fs._data["m"]) == ["a", "b", "c"], list(fs._data["m"])
+        _full = lambda: dumpJsonS(fs._data, ensure_ascii=False, indent=4).encode()
+        assert fs._serialize() == _full(), fs._serialize()
+        fs._data["m"]["b"]["y"] = {"z": 1}
+        fs.mark_dirty("m", "b")
+        assert fs._serialize() == _full(), fs._serialize()
+        fs._data["m"]["a"]["w"] = 2
+        assert fs._serialize() != _full(), "unmarked change should not be serialized"
+        fs.mark_dirty("m")
+        assert fs._serialize() == _full(), fs._serialize()
+        fs = FileStation(test_filepath, track_dirty=3)
+        _x = lambda: FileStation.fragments[fs._filepath].children["m"].children["b"]
+        fs._data["m"]["b"]["y"]["z"] = 2
+        fs.mark_dirty("m", "b", "y", "z")
+        assert fs._serialize() == _full(), fs._serialize()
+        _before = _x().children["x"]
+        fs._data["m"]["b"]["y"]["z"] = 3
+        fs.mark_dirty("m", "b", "y")
+        assert fs._serialize() == _full(), fs._serialize()
+        assert _x().children["x"] is _before, "unchanged fragment should be reused"
+        del FileStation.dirty[fs._filepath]
+        del FileStation.depths[fs._filepath]
+
+    def test_digest() -> Optional[AssertionError]:
+        """
+        ###   FileStation - 测试跳过未变更的写入
+        """
+        for track_dirty in (False, True):
+            fs = FileStation(test_filepath, track_dirty=track_dirty)
+            fs._update("k", {"v": track_dirty})
+            assert fs.do_save() is True
+            _digest = fs._digest()
+            assert _digest == FileStation.digests[fs._filepath], _digest
+            with open(test_filepath, "w", encoding="utf-8") as f:
+                f.write("untouched")
+            assert fs.do_save_safe() is True
+            with open(test_filepath, "r", encoding="utf-8") as f:
+                assert f.read() == "untouched"
+            fs._update("k", {"v": None})
+            assert fs.do_save_safe() is True
+            with open(test_filepath, "r", encoding="utf-8") as f:
+                assert loadJson(f)["k"] == {"v": None}
+            FileStation.dirty.pop(fs._filepath, None)
+
+    def test_prepare_save() -> Optional[AssertionError]:
+        """
+        ###   FileStation - 测试快照写入
+        """
+        for track_dirty in (False, True):
+            fs = FileStation(test_filepath, track_dirty=track_dirty)
+            fj = FileJournal(test_filepath)
+            fs._update("k", {"v": "snapshot"})
+            fj.append({"k": "snapshot"})
+            fj.commit()
+            job = fs.prepare_save(safe=True)
+            if not track_dirty:
+                fs._data["k"]["v"] = "in place"
+            fs._update("k", {"v": "later"})
+            fj.append({"k": "later"})
+            fj.commit()
+            assert FileStation.executor.submit(job).result() is True
+            with open(test_filepath, "r", encoding="utf-8") as f:
+                assert loadJson(f)["k"] == {"v": "snapshot"}
+            assert list(fj.replay()) == [{"k": "later"}], list(fj.replay())
+            del FileStation.journals[fs._filepath]
+            FileStation.dirty.pop(fs._filepath, None)
+        older = fs.prepare_save()
+        fs._update("k", {"v": "newer"})
+        assert fs.prepare_save()() is True and older() is True
+        with open(test_filepath, "r", encoding="utf-8") as f:
+            assert loadJson(f)["k"] == {"v": "newer"}
+
+    def test_flush_queue() -> Optional[AssertionError]:
+        """
+        ###   FlushQueue - 测试写入队列
+        """
+        from asyncio import run
+
+        fq = FlushQueue(concurrency=1, backoff=60)
+        good = Path(test_filepath).resolve()
+        bad = good / "unreachable.json"
+        FileStation(good)._update("k", "queued")
+        fq.add(bad)
+        fq.add(good)
+        fq.add(bad, critical=True)
+        assert list(fq) == [bad, good] and fq.due() == [bad, good], fq.due()
+        assert fq.stats()["depth"] == 2, fq.stats()
+        assert run(fq.flush()) == 1
+        assert list(fq) == [bad] and fq.stats()["retrying"] == 1, fq.stats()
+        assert fq.stats()["flushes"] == 1 and fq.stats()["flushed_bytes"] > 0
+        assert fq.due() == [] and fq.due(force=True) == [bad], fq.due()
+        assert run(fq.flush()) == 0 and list(fq) == [bad]
+        with open(good, "r", encoding="utf-8") as f:
+            assert loadJson(f)["k"] == "queued"
+
+    def test_atomic_write() -> Optional[AssertionError]:
+        """
+        ###   FileStation - 测试原子写入与副本恢复
+        """
+        path = Path(test_filepath).with_name("atomic.json").resolve()
+        vacuum(path)
         try:
-            remove(test_filepath)
-        except FileNotFoundError:
+            fs = FileStation(path)
+            fs._insert("k", "v")
+            assert fs.do_save() is True
+            assert not Path(f"{path}_safe").exists()
+            with open(f"{path}_safe", "w", encoding="utf-8") as f:
+                f.write('{"k": "trunc')
+            FileStation.superfetch.pop(path)
+            fs = FileStation(path)
+            assert fs._data == {"k": "v"}, fs._data
+            assert not Path(f"{path}_safe").exists()
+            replace(path, f"{path}_safe")
+            FileStation.superfetch.pop(path)
+            fs = FileStation(path)
+            assert fs._data == {"k": "v"}, fs._data
+            assert path.exists() and not Path(f"{path}_safe").exists()
+            replace(path, f"{path}_safe")
+            with open(f"{path}_safe", "a", encoding="utf-8") as f:
+                f.write("{")
+            FileStation.superfetch.pop(path)
+            fs = FileStation(path)
+            assert fs._data == {}, fs._data
+            assert Path(f"{path}_corrupt").exists()
+        finally:
+            vacuum(path)
+
+    def test_serializer() -> Optional[AssertionError]:
+        """
+        ###   Serializer - 测试文件格式
+        """
+        data = {
+            "m": {"b": {"x": [1, "二/三", None, True, 1.5, 2**70]}, "a": {}},
+            "e": {},
+            "d": [],
+        }
+        for serializer in serializers.values():
+            raw = serializer.dumps(data)
+            assert serializer.loads(raw) == data, serializer.name
+            assert detect(raw).loads(raw) == data, serializer.name
+        try:
+            type("Partial", (Serializer,), {"loads": PrettyJson.loads})()
+        except TypeError:
             pass
+        else:
+            raise AssertionError("Serializer 缺少方法时应无法实例化")
+        path = Path(test_filepath).with_name("format.json").resolve()
+        vacuum(path)
+        try:
+            fs = FileStation(path, track_dirty=True, serializer="binary")
+            fs._data.update(loadJsonS(dumpJsonS(data)))
+            fs.mark_dirty("m")
+            fs.mark_dirty("e")
+            fs.mark_dirty("d")
+            assert fs._serialize() == serializers["binary"].dumps(fs._data)
+            assert fs.do_save() is True
+            with open(path, "rb") as f:
+                assert f.read().startswith(Binary.header)
+            FileStation.superfetch.pop(path)
+            fs = FileStation(path, track_dirty=True)
+            assert fs._data == data and fs.serializer.name == "binary", fs._data
+            fs.serializer = serializers["compact"]
+            assert fs._serialize() == dumpJsonS(fs._data, ensure_ascii=False).encode()
+            with open(fs.export(), "r", encoding="utf-8") as f:
+                assert loadJson(f) == data
+            try:
+                serializers["binary"].loads(serializers["binary"].dumps(data)[:-1])
+                assert False, "truncated file should not be loaded"
+            except ValueError:
+                pass
+        finally:
+            vacuum(path)
+
+    def test_lazy() -> Optional[AssertionError]:
+        """
+        ###   LazyMapping - 测试延迟解码
+        """
+        data = {
+            "m": {
+                "group": {
+                    f"{i}": {"enabled": ["a", "b"], "level": i} for i in range(500)
+                }
+            },
+            "n": 1,
+        }
+        path = Path(test_filepath).with_name("lazy.json").resolve()
+        vacuum(path)
+        try:
+            with open(path, "wb") as f:
+                f.write(serializers["binary"].dumps(data))
+            fs = FileStation(path, unsafe=True, track_dirty=True, lazy=True)
+            group = fs._data["m"]["group"]
+            assert isinstance(group, LazyMapping) and group.decoded() == 0, group
+            assert group["7"] == {"enabled": ["a", "b"], "level": 7}
+            assert group.decoded() == 1, group
+            group["7"]["level"] = 0
+            group["500"] = {}
+            fs.mark_dirty("m")
+            data["m"]["group"]["7"]["level"] = 0
+            data["m"]["group"]["500"] = {}
+            assert fs._serialize() == serializers["binary"].dumps(data)
+            assert group.decoded() == 2, group
+            assert fs.do_save() is True
+            FileStation.superfetch.pop(path)
+            assert FileStation(path)._data == data
+            assert loadJsonS(dumpJsonS(fs._data)) == data
+        finally:
+            vacuum(path)
+
+    def test_cow() -> Optional[AssertionError]:
+        """
+        ###   CowMapping - 测试写时复制视图
+        """
+        base = {"a": {"b": {"c": 1}, "l": [1, {"x": 2}]}, "d": 3}
+        view = CowMapping(base)
+        assert view == base and len(view) == 2, view
+        view["a"]["b"]["c"] = 9
+        view["a"]["l"][1]["x"] = 8
+        view["e"] = 4
+        del view["d"]
+        assert base == {"a": {"b": {"c": 1}, "l": [1, {"x": 2}]}, "d": 3}, base
+        assert view == {"a": {"b": {"c": 9}, "l": [1, {"x": 8}]}, "e": 4}, view
+        assert list(view) == ["a", "e"] and "d" not in view, list(view)
+        assert loadJsonS(dumpJsonS(view)) == view.toDict()
+        base["f"] = 5
+        assert view["f"] == 5
+
+    def test_file_lock() -> Optional[AssertionError]:
+        """
+        ###   FileLock - 测试文件锁与版本号
+        """
+        path = Path(test_filepath).with_name("locked.json").resolve()
+        vacuum(path)
+        try:
+            lock = FileLock(path)
+            fs = FileStation(path)
+            fs._insert("k", "v")
+            assert lock.known == 0 and fs.do_save() is True
+            with lock.acquire():
+                with lock.acquire():
+                    assert lock.bump() == 1
+                assert lock.generation() == 1
+            _stamp = lock.stamp()
+            with lock.acquire():
+                lock.bump()
+            lock.known = 1
+            assert lock.stamp() != _stamp
+            fs._update("k", "stale")
+            assert fs.do_save() is True
+            with open(path, "r", encoding="utf-8") as f:
+                assert loadJson(f) == {"k": "v"}, "stale data should not be written"
+            fs.reload(full=True)
+            assert lock.known == 2 and fs._data == {"k": "v"}, fs._data
+            with lock.acquire(blocking=False) as acquired:
+                assert acquired and lock.generation() == 2
+            _other = FileLock(path)
+            with lock.acquire():
+                with _other.acquire(blocking=False) as acquired:
+                    assert not acquired, "lock held by another descriptor"
+        finally:
+            vacuum(path)
+
+    def test_compact() -> Optional[AssertionError]:
+        """
+        ###   FileStation - 测试内存统计与压缩
+        """
+        path = Path(test_filepath).with_name("compact.json").resolve()
+        vacuum(path)
+        try:
+            fs = FileStation(path)
+            raw = dumpJsonS(
+                {f"{i}": {"on": ["service", f"s{i % 3}"]} for i in range(200)}
+            )
+            fs._insert("groups", loadJsonS(raw))
+            groups = fs._data["groups"]
+            assert fs.memory() > fs.memory(deep=False) and deep_sizeof("x" * 100) > 100
+            assert deep_sizeof([groups, groups]) < 2 * deep_sizeof(groups)
+            before, after = fs.compact(freeze=True)
+            assert after < before and fs._memory() == after, (before, after)
+            assert fs._data["groups"] is groups and dumpJsonS(groups) == raw
+            assert groups["1"]["on"] == ("service", "s1"), groups["1"]
+            assert groups["1"]["on"][0] is groups["2"]["on"][0]
+            assert FileStation.memory_report()[path] == after
+            assert fs.do_save() is True
+        finally:
+            vacuum(path)
+
+    def test_flush_policy() -> Optional[AssertionError]:
+        """
+        ###   FlushPolicy - 测试写入策略
+        """
+        fq = FlushQueue()
+        fq.policy = FlushPolicy(max_age=100, max_pending=3, idle=50)
+        a, b = Path("a.json"), Path("b.json")
+        fq.add(a)
+        fq.add(b)
+        assert fq.due(policy=True) == [], fq.due(policy=True)
+        assert 49 < fq.next_deadline() - monotonic() <= 50, fq.next_deadline()
+        fq.add(b)
+        fq.add(b)
+        assert fq.due(policy=True) == [b], fq.due(policy=True)
+        fq._entries[a].enqueued -= 100
+        fq._entries[a].changed -= 10
+        assert fq.due(policy=True) == [a, b], fq.due(policy=True)
+        assert fq.stats()["triggers"] == {"age": 1, "pending": 2, "idle": 0}
+        assert fq.stats()["pending"] == 4 and fq.stats()["mutations"] == 4
+
+    def vacuum(*paths: str | Path) -> None:
+        """
+        ###   FileStation - 测试垃圾回收
+        -     删除测试文件及其变更日志、副本、锁文件与导出文件，并清除测试文件在各个注册表中的状态。
+        -     未指定 paths 时清理 test_filepath。
+        """
+        for _path in (Path(i).resolve() for i in paths or (test_filepath,)):
+            for _suffix in (
+                "",
+                ".journal",
+                "_safe",
+                "_corrupt",
+                ".lock",
+                ".export.json",
+            ):
+                Path(f"{_path}{_suffix}").unlink(missing_ok=True)
+            for _registry in (
+                FileStation.superfetch,
+                FileStation.dirty,
+                FileStation.depths,
+                FileStation.fragments,
+                FileStation.digests,
+                FileStation.sequences,
+                FileStation.journals,
+                FileStation.locks,
+                FileStation.formats,
+            ):
+                _registry.pop(_path, None)
+            FileStation.save_queue.discard(_path)
 
     def test_all() -> Optional[AssertionError]:
         """
         ###   FileStation - 测试所有测试用例
         """
         vacuum()
+        test_journal()
+        test_track_dirty()
+        test_digest()
+        test_prepare_save()
+        test_flush_queue()
+        test_flush_policy()
+        test_atomic_write()
+        test_serializer()
+        test_lazy()
+        test_cow()
+        test_file_lock()
+        test_compact()
+        vacuum()
         test_init()
         test_save()
         test_load_from_json_string()
@@ -819,16 +2937,15 @@ else:
     from nonebot import get_driver, require
     from nonebot.adapters import Bot
 
+    driver = get_driver()
+
     FileStation.scheduler = require("nonebot_plugin_apscheduler").scheduler
-    FileStation.scheduler.add_job(
-        FileStation.save_job,
-        "interval",
-        minutes=5,
-        misfire_grace_time=300,
-        id="FileStation.save_job",
+    FileStation.save_queue.policy = FlushPolicy(
+        max_age=float(getattr(driver.config, "ram_flush_max_age", 300) or 300),
+        max_pending=int(getattr(driver.config, "ram_flush_max_pending", 100) or 100),
+        idle=float(getattr(driver.config, "ram_flush_idle", 10) or 10),
     )
-
-    driver = get_driver()
+    FileStation.save_queue.listener = FileStation.schedule_flush
 
     @driver.on_shutdown
     async def clear_queue() -> None:
@@ -838,27 +2955,7 @@ else:
             logger.opt(colors=True).warning(
                 f"<y>FileStation.save_queue</y> is not empty, waiting for {_len} files to be saved"
             )
-            while _len:
-                success = FileStation(
-                    list(FileStation.save_queue)[0], unsafe=True
-                ).do_save()
-                if success:
-                    # logger.success(f"Saved {list(FileStation.save_queue)[0]}")
-                    FileStation.save_queue.remove(list(FileStation.save_queue)[0])
-                    _len -= 1
-                else:
-                    logger.warning(f"Failed to save {list(FileStation.save_queue)[0]}")
-                    try:
-                        _success = FileStation(
-                            list(FileStation.save_queue)[1]
-                        ).do_save()
-                        if _success:
-                            FileStation.save_queue.remove(
-                                list(FileStation.save_queue)[1]
-                            )
-                            _len -= 1
-                    except IndexError:
-                        break
+            await FileStation.save_queue.flush(force=True)
             if FileStation.save_queue:
                 logger.warning(f"{len(FileStation.save_queue)} files not saved")
             else:
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Optional
+
+from ._FileStation import FileStation
+
+OUTCOMES = ("allowed", "denied", "unsupported_event", "unsupported_adapter")
+"""Rule 判定的全部结果"""
+
+
+def _sample(value: float) -> str:
+    """
+    ###   说明
+    -     Prometheus 样本值的文本，整数原样输出，浮点数输出能精确还原的最短表示，不会像 `:g` 一样只保留 6 位有效数字
+    """
+    return f"{value}" if isinstance(value, int) else repr(float(value))
+
+
+class Histogram:
+    """
+    ##    Histogram - 累积分布直方图
+    -     以秒为单位记录耗时，分桶的上界固定，记录一次只需一次二分查找。
+    """
+
+    bounds = (
+        0.000001,
+        0.0000025,
+        0.000005,
+        0.00001,
+        0.000025,
+        0.00005,
+        0.0001,
+        0.00025,
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+    )
+    """分桶上界，最后还有一个不设上界的桶"""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        """
+        ###   Histogram - 累积计数
+        -     返回 (上界, 不超过该上界的次数)，与 Prometheus 的 `le` 标签一致
+        """
+        _result = []
+        _total = 0
+        for _bound, _count in zip((*self.bounds, None), self.counts):
+            _total += _count
+            _result.append(("+Inf" if _bound is None else _sample(_bound), _total))
+        return _result
+
+
+class Metrics:
+    """
+    ##    Metrics - RAM 运行指标
+    -     Rule 每次判定的结果与耗时，以及每个功能或级别被判定的次数
+    -     写入队列的状态由 `FileStation.save_queue.stats()` 实时读取，不在这里重复计数
+    """
+
+    def __init__(self) -> None:
+        self.decisions: dict[str, int] = dict.fromkeys(OUTCOMES, 0)
+        self.latency: dict[str, Histogram] = {i: Histogram() for i in OUTCOMES}
+        self.services: dict[str, dict[str, int]] = {}
+
+    def observe(self, outcome: str, rule: Optional[str], seconds: float) -> None:
+        """
+        ###   Metrics - 记录一次判定
+
+        ###   参数
+        -     outcome: str  判定结果，见 `OUTCOMES`
+        -     rule: str  功能名称或 `level>=N`，无法判定时为 None
+        -     seconds: float  判定耗时
+        """
+        self.decisions[outcome] += 1
+        self.latency[outcome].observe(seconds)
+        if rule is not None:
+            _hits = self.services.get(rule)
+            if _hits is None:
+                _hits = self.services[rule] = {"allowed": 0, "denied": 0}
+            _hits[outcome] += 1
+
+    def reset(self) -> None:
+        self.__init__()
+
+    def render(self) -> str:
+        """
+        ###   Metrics - 导出
+        -     返回 Prometheus 文本格式的全部指标
+        """
+        _lines = [
+            "# HELP ram_decisions_total Rule decisions by outcome.",
+            "# TYPE ram_decisions_total counter",
+        ]
+        for _outcome, _count in self.decisions.items():
+            _lines.append(f'ram_decisions_total{{outcome="{_outcome}"}} {_count}')
+        _lines += [
+            "# HELP ram_decision_seconds Time spent deciding a rule.",
+            "# TYPE ram_decision_seconds histogram",
+        ]
+        for _outcome, _histogram in self.latency.items():
+            for _le, _count in _histogram.cumulative():
+                _lines.append(
+                    f'ram_decision_seconds_bucket{{outcome="{_outcome}",le="{_le}"}} {_count}'
+                )
+            _lines.append(
+                f'ram_decision_seconds_sum{{outcome="{_outcome}"}} {_sample(_histogram.sum)}'
+            )
+            _lines.append(
+                f'ram_decision_seconds_count{{outcome="{_outcome}"}} {_histogram.count}'
+            )
+        _lines += [
+            "# HELP ram_service_decisions_total Rule decisions by service or level.",
+            "# TYPE ram_service_decisions_total counter",
+        ]
+        for _rule, _hits in sorted(self.services.items()):
+            _rule = _rule.replace("\\", "\\\\").replace('"', '\\"')
+            for _outcome, _count in _hits.items():
+                _lines.append(
+                    f'ram_service_decisions_total{{service="{_rule}",outcome="{_outcome}"}} {_count}'
+                )
+        _stats = FileStation.save_queue.stats()
+        for _name, _type, _help, _value in (
+            ("ram_save_queue_depth", "gauge", "Files waiting to be saved.", "depth"),
+            (
+                "ram_save_queue_oldest_age_seconds",
+                "gauge",
+                "Age of the oldest unsaved change.",
+                "oldest_age",
+            ),
+            ("ram_save_queue_pending", "gauge", "Changes not saved yet.", "pending"),
+            ("ram_flushes_total", "counter", "Flushes that wrote files.", "flushes"),
+            (
+                "ram_flush_seconds_total",
+                "counter",
+                "Time spent flushing.",
+                "flush_seconds",
+            ),
+            (
+                "ram_flush_bytes_total",
+                "counter",
+                "Bytes written by flushes.",
+                "flushed_bytes",
+            ),
+            ("ram_file_writes_total", "counter", "Files written.", "writes"),
+        ):
+            _lines += [
+                f"# HELP {_name} {_help}",
+                f"# TYPE {_name} {_type}",
+                f"{_name} {_sample(_stats[_value])}",
+            ]
+        return "\n".join(_lines) + "\n"
+
+    def summary(self) -> str:
+        """
+        ###   Metrics - 摘要
+        -     返回供 `ram` 指令展示的简短文本
+        """
+        _stats = FileStation.save_queue.stats()
+        _lines = []
+        for _outcome in OUTCOMES:
+            _histogram = self.latency[_outcome]
+            _mean = _histogram.sum / _histogram.count * 1e6 if _histogram.count else 0
+            _lines.append(f"{_outcome}: {_histogram.count} 次，平均 {_mean:.1f} μs")
+        _top = sorted(self.services.items(), key=lambda i: -sum(i[1].values()))[:5]
+        if _top:
+            _lines.append(
+                "最常判定："
+                + " ".join(
+                    f"{_rule}({_hits['allowed']}/{sum(_hits.values())})"
+                    for _rule, _hits in _top
+                )
+            )
+        _lines.append(
+            f"待写入：{_stats['depth']} 个文件，最早 {_stats['oldest_age']:.0f} 秒前"
+        )
+        _seconds = (
+            _stats["flush_seconds"] / _stats["flushes"] if _stats["flushes"] else 0
+        )
+        _lines.append(
+            f"已写入：{_stats['flushes']} 次，平均 {_seconds * 1000:.1f} ms，共 {_stats['flushed_bytes']} 字节"
+        )
+        return "\n".join(_lines)
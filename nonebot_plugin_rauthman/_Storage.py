@@ -0,0 +1,537 @@
+from __future__ import annotations
+
+import sqlite3
+from abc import ABC, abstractmethod
+from collections.abc import MutableMapping
+from itertools import count
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from loguru import logger
+from ujson import dumps as dumpJsonS
+from ujson import loads as loadJsonS
+
+from ._FileStation import (
+    FileStation,
+    atomic_write,
+    generate_savedata_path,
+    write_lock,
+)
+
+
+class StorageBackend(ABC):
+    """
+    ##    StorageBackend - 授权记录存储后端
+    -     FileStation 之外的另一种持久化方式，按 (adapter, scope, group_id) 存取单条授权记录。
+    -     每条记录的格式与 JSON 存档中的群聊数据一致，即包含 enabled, disabled, level 的 dict。
+    -     records() 返回的映射可以直接替代 JSON 存档中的 `group` 或 `private` 字典使用。
+    """
+
+    lazy: bool = False
+    """记录是否按需加载，为 True 时 RAM_Control 不会在启动时编译全部记录"""
+
+    @abstractmethod
+    def records(self, adapter: str, scope: str) -> MutableMapping[str, dict]:
+        """
+        ###   StorageBackend - 获取记录映射
+
+        ###   参数
+        -     adapter: str  adapter 名称，如 `onebot_v11`
+        -     scope: str  `group` 或 `private`
+        """
+
+    def find(
+        self,
+        adapter: str,
+        scope: str,
+        service: Optional[str] = None,
+        *,
+        enabled: bool = True,
+        min_level: Optional[int] = None,
+        max_level: Optional[int] = None,
+    ) -> Optional[list[str]]:
+        """
+        ###   StorageBackend - 查询记录
+        -     返回启用（或禁用）了 service、且级别在 [min_level, max_level] 之间的记录的键，未指定的条件不设限。
+        -     后端无法高效查询时返回 None，由 RAM_Control 的内存索引回答，默认返回 None。
+        """
+        return None
+
+    @abstractmethod
+    def is_empty(self) -> bool: ...
+
+    def refresh(self) -> None:
+        """
+        ###   StorageBackend - 丢弃缓存
+        -     其他进程提交了修改后调用，之后的读取应当反映这些修改。
+        """
+        pass
+
+    @abstractmethod
+    def commit(self) -> None: ...
+
+    def prepare_commit(self) -> Callable[[], None]:
+        """
+        ###   StorageBackend - 准备提交
+        -     返回一个可以在任意线程中执行的提交任务，提交失败时任务抛出异常。
+        -     默认在当前线程中直接提交，返回空任务。
+        """
+        self.commit()
+        return lambda: None
+
+    @abstractmethod
+    def close(self) -> None: ...
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    ##    SQLiteBackend - 基于 SQLite 的授权记录存储后端
+    -     使用 WAL 模式，读写单条记录、修改单条记录、按功能或级别查询记录都是索引操作。
+    -     `record` 表以 (adapter, scope, group_id) 为唯一索引，`service` 表保存每条记录启用与禁用的功能。
+    -     记录按需加载，启动时不会读取全部记录，见 find()。
+    """
+
+    lazy = True
+
+    _schema = """
+    CREATE TABLE IF NOT EXISTS record (
+        id INTEGER PRIMARY KEY,
+        adapter TEXT NOT NULL,
+        scope TEXT NOT NULL,
+        group_id TEXT NOT NULL,
+        level INTEGER,
+        UNIQUE (adapter, scope, group_id)
+    );
+    CREATE TABLE IF NOT EXISTS service (
+        record INTEGER NOT NULL REFERENCES record (id) ON DELETE CASCADE,
+        name TEXT NOT NULL,
+        enabled INTEGER NOT NULL,
+        PRIMARY KEY (record, name)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS service_name ON service (name, enabled);
+    CREATE INDEX IF NOT EXISTS record_level ON record (adapter, scope, level);
+    """
+
+    def __init__(self, filepath: str | Path) -> None:
+        """
+        ###   SQLiteBackend - 构造函数
+
+        ###   参数
+        -     filepath: str | Path  数据库文件路径，目录不存在时会自动创建
+        """
+        self._filepath = Path(filepath).resolve()
+        self._filepath.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self._filepath)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(self._schema)
+        self._conn.commit()
+
+    def records(self, adapter: str, scope: str) -> SQLiteRecords:
+        return SQLiteRecords(self._conn, adapter, scope)
+
+    def find(
+        self,
+        adapter: str,
+        scope: str,
+        service: Optional[str] = None,
+        *,
+        enabled: bool = True,
+        min_level: Optional[int] = None,
+        max_level: Optional[int] = None,
+    ) -> list[str]:
+        """
+        ###   SQLiteBackend - 查询记录
+        -     按功能查询使用 `service_name` 索引，按级别查询使用 `record_level` 索引。
+        -     没有级别的记录视为级别 0。
+        """
+        _sql = "SELECT record.group_id FROM record"
+        _where = ["record.adapter = ?", "record.scope = ?"]
+        _args: list = [adapter, scope]
+        if service is not None:
+            _sql += " JOIN service ON service.record = record.id"
+            _where += ["service.name = ?", "service.enabled = ?"]
+            _args += [service, int(enabled)]
+        if min_level is not None or max_level is not None:
+            _range = []
+            if min_level is not None:
+                _range.append("record.level >= ?")
+                _args.append(min_level)
+            if max_level is not None:
+                _range.append("record.level <= ?")
+                _args.append(max_level)
+            _clause = " AND ".join(_range)
+            if (min_level is None or min_level <= 0) and (
+                max_level is None or max_level >= 0
+            ):
+                _clause = f"({_clause} OR record.level IS NULL)"
+            _where.append(_clause)
+        return [
+            row[0]
+            for row in self._conn.execute(f"{_sql} WHERE {' AND '.join(_where)}", _args)
+        ]
+
+    def is_empty(self) -> bool:
+        return self._conn.execute("SELECT 1 FROM record LIMIT 1").fetchone() is None
+
+    def commit(self) -> None:
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class SQLiteRecords(MutableMapping):
+    """
+    ##    SQLiteRecords - 某个 adapter 与 scope 下的记录映射
+    -     读取时从数据库组装出记录的 dict，写入时整条替换该记录，不会影响其他记录。
+    -     对取出的 dict 进行修改不会自动写回，需要重新赋值。
+    """
+
+    def __init__(self, conn: sqlite3.Connection, adapter: str, scope: str) -> None:
+        self._conn = conn
+        self._adapter = adapter
+        self._scope = scope
+
+    def _id(self, key: str) -> Optional[int]:
+        row = self._conn.execute(
+            "SELECT id FROM record WHERE adapter = ? AND scope = ? AND group_id = ?",
+            (self._adapter, self._scope, key),
+        ).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _assemble(level: Optional[int], services: list[tuple[str, int]]) -> dict:
+        home = {}
+        enabled = sorted(name for name, state in services if state)
+        disabled = sorted(name for name, state in services if not state)
+        if enabled:
+            home["enabled"] = enabled
+        if disabled:
+            home["disabled"] = disabled
+        if level is not None:
+            home["level"] = level
+        return home
+
+    def __getitem__(self, key: str) -> dict:
+        row = self._conn.execute(
+            "SELECT id, level FROM record WHERE adapter = ? AND scope = ? AND group_id = ?",
+            (self._adapter, self._scope, key),
+        ).fetchone()
+        if row is None:
+            raise KeyError(key)
+        services = self._conn.execute(
+            "SELECT name, enabled FROM service WHERE record = ?", (row[0],)
+        ).fetchall()
+        return self._assemble(row[1], services)
+
+    def __setitem__(self, key: str, home: dict) -> None:
+        self._conn.execute(
+            "INSERT INTO record (adapter, scope, group_id, level) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (adapter, scope, group_id) DO UPDATE SET level = excluded.level",
+            (self._adapter, self._scope, key, home.get("level")),
+        )
+        _id = self._id(key)
+        self._conn.execute("DELETE FROM service WHERE record = ?", (_id,))
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO service (record, name, enabled) VALUES (?, ?, ?)",
+            [(_id, name, 1) for name in home.get("enabled", ())]
+            + [(_id, name, 0) for name in home.get("disabled", ())],
+        )
+
+    def __delitem__(self, key: str) -> None:
+        cursor = self._conn.execute(
+            "DELETE FROM record WHERE adapter = ? AND scope = ? AND group_id = ?",
+            (self._adapter, self._scope, key),
+        )
+        if not cursor.rowcount:
+            raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return self._id(key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for row in self._conn.execute(
+            "SELECT group_id FROM record WHERE adapter = ? AND scope = ?",
+            (self._adapter, self._scope),
+        ):
+            yield row[0]
+
+    def __len__(self) -> int:
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM record WHERE adapter = ? AND scope = ?",
+            (self._adapter, self._scope),
+        ).fetchone()[0]
+
+    def items(self) -> Iterator[tuple[str, dict]]:
+        """
+        ###   SQLiteRecords - 遍历所有记录
+        -     只用两次查询取出全部记录，避免逐条查询。
+        """
+        services: dict[int, list[tuple[str, int]]] = {}
+        for _id, name, state in self._conn.execute(
+            "SELECT service.record, service.name, service.enabled FROM service"
+            " JOIN record ON record.id = service.record"
+            " WHERE record.adapter = ? AND record.scope = ?",
+            (self._adapter, self._scope),
+        ):
+            services.setdefault(_id, []).append((name, state))
+        for _id, key, level in self._conn.execute(
+            "SELECT id, group_id, level FROM record WHERE adapter = ? AND scope = ?",
+            (self._adapter, self._scope),
+        ):
+            yield key, self._assemble(level, services.get(_id, []))
+
+
+class ShardedBackend(StorageBackend):
+    """
+    ##    ShardedBackend - 按群聊分片的授权记录存储后端
+    -     每条记录保存在 generate_savedata_path() 对应的 `<adapter>/group/<id>.json` 或 `<adapter>/private/<id>.json` 中。
+    -     分片文件与其他模块共用，记录保存在其中的 `RAM` 字段下，由 FileStation 读写。
+    -     修改一条记录只会写入它自己的分片，分片在第一次被访问时才会加载。
+    -     清单文件记录了所有分片的键，启动时无需扫描目录即可枚举记录，清单丢失时会扫描目录重建。
+    -     分片保存在 Bot 类型对应的目录中，与 `generate_savedata_path(_bot=bot)` 一致，见构造函数的 types 参数。
+    """
+
+    lazy = True
+    module_name: str = "RAM"
+    """分片文件中保存记录的字段"""
+
+    def __init__(
+        self, filepath: str | Path, types: Optional[dict[str, str]] = None
+    ) -> None:
+        """
+        ###   ShardedBackend - 构造函数
+
+        ###   参数
+        -     filepath: str | Path  清单文件路径
+        -     types: dict[str, str]  adapter 名称到 Bot 类型的映射，如 `onebot_v11` 到 `OneBot V11`，默认为 None，即目录名与 adapter 名称相同
+        """
+        self._filepath = Path(filepath).resolve()
+        self._types = types or {}
+        self._adapters = {v: k for k, v in self._types.items()}
+        self._numbers = count()
+        self._written = -1
+        self._pending: dict[Path, FileStation] = {}
+        self._loaded: set[Path] = set()
+        self._manifest_dirty = False
+        self._manifest: dict[str, dict[str, set[str]]] = {}
+        self._load_manifest()
+
+    def _load_manifest(self) -> None:
+        try:
+            with open(self._filepath, "r", encoding="utf-8") as f:
+                _manifest = loadJsonS(f.read())
+        except FileNotFoundError:
+            _manifest = self._scan()
+            self._manifest_dirty = bool(_manifest)
+        for adapter, scopes in _manifest.items():
+            for scope, keys in scopes.items():
+                _keys = self.keys_of(adapter, scope)
+                _keys.clear()
+                _keys.update(keys)
+
+    def refresh(self) -> None:
+        """
+        ###   ShardedBackend - 丢弃缓存
+        -     重新读取清单，并丢弃 Superfetch 中已加载的分片，分片在下次访问时从磁盘重新加载。
+        """
+        self._load_manifest()
+        for path in self._loaded:
+            FileStation.superfetch.pop(path, None)
+        self._loaded.clear()
+
+    def _scan(self) -> dict[str, dict[str, set[str]]]:
+        """
+        ###   ShardedBackend - 扫描分片
+        -     在存档目录中查找含有 `RAM` 字段的分片，重建清单。
+        """
+        _manifest = {}
+        _root = Path(generate_savedata_path())
+        for scope in ("group", "private"):
+            for path in _root.glob(f"*/{scope}/*.json"):
+                if not path.stem.isdigit():
+                    continue
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        if self.module_name not in loadJsonS(f.read()):
+                            continue
+                except (OSError, ValueError):
+                    continue
+                _adapter = self._adapters.get(
+                    path.parent.parent.name, path.parent.parent.name
+                )
+                _manifest.setdefault(_adapter, {}).setdefault(scope, set()).add(
+                    path.stem
+                )
+        if _manifest:
+            logger.info(f"Rebuilt {self._filepath.name} from savedata")
+        return _manifest
+
+    def keys_of(self, adapter: str, scope: str) -> set[str]:
+        return self._manifest.setdefault(adapter, {}).setdefault(scope, set())
+
+    def shard(self, adapter: str, scope: str, key: str) -> FileStation:
+        """
+        ###   ShardedBackend - 打开分片
+        -     返回分片的 FileStation 对象，分片文件不存在时返回空的 FileStation 对象。
+        -     键不是正整数时抛出 ValueError，generate_savedata_path() 会把 0 当作全局存档。
+        """
+        if not key.isdigit() or not int(key):
+            raise ValueError(f"Invalid {scope} id {key}")
+        _path = Path(
+            generate_savedata_path(
+                int(key),
+                flag=1 if scope == "group" else 0,
+                _type=self._types.get(adapter, adapter),
+            )
+        )
+        if _path not in FileStation.superfetch and not _path.exists():
+            FileStation.superfetch[_path] = {self.module_name: {}}
+        self._loaded.add(_path)
+        return FileStation(_path, self.module_name)
+
+    def touch(self, shard: FileStation, *, keys_changed: bool = False) -> None:
+        """
+        ###   ShardedBackend - 标记分片
+        -     将分片加入待写入列表，只有新增或删除了键时才需要重写清单。
+
+        ###   参数
+        -     keys_changed: bool  是否新增或删除了清单中的键，默认为 False
+        """
+        self._pending[shard._filepath] = shard
+        if keys_changed:
+            self._manifest_dirty = True
+
+    def records(self, adapter: str, scope: str) -> ShardedRecords:
+        return ShardedRecords(self, adapter, scope)
+
+    def is_empty(self) -> bool:
+        return not any(
+            keys for scopes in self._manifest.values() for keys in scopes.values()
+        )
+
+    def commit(self) -> None:
+        """
+        ###   ShardedBackend - 提交
+        -     在当前线程中执行 prepare_commit() 返回的提交任务。
+        """
+        self.prepare_commit()()
+
+    def prepare_commit(self) -> Callable[[], None]:
+        """
+        ###   ShardedBackend - 准备提交
+        -     在当前线程中取得被修改过的分片与清单的快照，返回一个可以在任意线程中执行的提交任务。
+        -     提交任务写入分片，全部成功后再写入清单，均为原子写入。
+        -     写入失败的分片与清单留待下次提交时重试，提交任务抛出 OSError。
+        """
+        _pending, self._pending = self._pending, {}
+        _jobs = {
+            path: shard.prepare_save(safe=True) for path, shard in _pending.items()
+        }
+        _manifest = None
+        if self._manifest_dirty:
+            _manifest = dumpJsonS(
+                {
+                    adapter: {scope: sorted(keys) for scope, keys in scopes.items()}
+                    for adapter, scopes in self._manifest.items()
+                }
+            ).encode("utf-8")
+            self._manifest_dirty = False
+        _number = next(self._numbers)
+
+        def _commit() -> None:
+            _failed = [path for path, job in _jobs.items() if not job()]
+            try:
+                if _failed:
+                    raise OSError(
+                        f"Failed to save {len(_failed)} shards, "
+                        f"e.g. {_failed[0]}, will retry on the next commit"
+                    )
+                if _manifest is None:
+                    return
+                with write_lock(self._filepath):
+                    if self._written > _number:
+                        return
+                    self._filepath.parent.mkdir(parents=True, exist_ok=True)
+                    atomic_write(self._filepath, _manifest)
+                    self._written = _number
+            except Exception:
+                for path in _failed:
+                    self._pending.setdefault(path, _pending[path])
+                self._manifest_dirty = self._manifest_dirty or _manifest is not None
+                raise
+
+        return _commit
+
+    def close(self) -> None:
+        self.commit()
+
+
+class ShardedRecords(MutableMapping):
+    """
+    ##    ShardedRecords - 某个 adapter 与 scope 下的分片记录映射
+    -     判断键是否存在、遍历键只读取清单，读取记录时才加载对应的分片。
+    -     读取时返回记录的拷贝，对取出的 dict 进行修改不会自动写回，需要重新赋值。
+    """
+
+    def __init__(self, backend: ShardedBackend, adapter: str, scope: str) -> None:
+        self._backend = backend
+        self._adapter = adapter
+        self._scope = scope
+        self._keys = backend.keys_of(adapter, scope)
+
+    def __getitem__(self, key: str) -> dict:
+        if key not in self._keys:
+            raise KeyError(key)
+        return loadJsonS(
+            dumpJsonS(self._backend.shard(self._adapter, self._scope, key).data)
+        )
+
+    def __setitem__(self, key: str, home: dict) -> None:
+        _shard = self._backend.shard(self._adapter, self._scope, key)
+        _shard._update(self._backend.module_name, loadJsonS(dumpJsonS(home)))
+        _added = key not in self._keys
+        self._keys.add(key)
+        self._backend.touch(_shard, keys_changed=_added)
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self._keys:
+            raise KeyError(key)
+        _shard = self._backend.shard(self._adapter, self._scope, key)
+        _shard._data.pop(self._backend.module_name, None)
+        self._keys.discard(key)
+        self._backend.touch(_shard, keys_changed=True)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._keys
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(sorted(self._keys))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+def open_backend(
+    name: str, filepath: str | Path, types: Optional[dict[str, str]] = None
+) -> Optional[StorageBackend]:
+    """
+    ###   说明
+    -     按名称打开存储后端，`json` 表示不使用存储后端，即使用 FileStation 本身
+
+    ###   参数
+    -     name: str  后端名称，可选值为 `json`, `sqlite`, `sharded`
+    -     filepath: str | Path  JSON 存档的文件路径，后端的文件保存在同目录下
+    -     types: dict[str, str]  adapter 名称到 Bot 类型的映射，见 ShardedBackend，默认为 None
+    """
+    if name == "json":
+        return None
+    elif name == "sqlite":
+        return SQLiteBackend(Path(filepath).with_suffix(".sqlite3"))
+    elif name == "sharded":
+        return ShardedBackend(Path(filepath).with_suffix(".manifest.json"), types)
+    else:
+        logger.warning(f"Unknown storage backend {name}, fallback to json")
+        return None